@@ -1,20 +1,32 @@
 # analyzers/apk_metadata_extractor.py
-from androguard.core.bytecodes.apk import APK
 import hashlib
 
-def extract_metadata(filepath):
+# Metadata only needs the manifest, so prefer pyaxmlparser's slim APK reader
+# and keep the full androguard parser for the DEX string scan
+try:
+    from pyaxmlparser import APK
+except ImportError:
+    from androguard.core.apk import APK
+
+def extract_metadata(filepath, apk=None):
     """
     Extracts key metadata from an APK file.
+    Pass an already parsed APK object to avoid parsing the file again.
     """
     try:
-        # Androguard APK object
-        apk = APK(filepath)
+        # pyaxmlparser APK object (androguard's when pyaxmlparser is not installed)
+        if apk is None:
+            apk = APK(filepath)
 
-        # Calculate file hashes
+        # Calculate file hashes in a single chunked pass
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
         with open(filepath, 'rb') as f:
-            file_bytes = f.read()
-            md5_hash = hashlib.md5(file_bytes).hexdigest()
-            sha256_hash = hashlib.sha256(file_bytes).hexdigest()
+            while chunk := f.read(1 << 20):
+                md5.update(chunk)
+                sha256.update(chunk)
+        md5_hash = md5.hexdigest()
+        sha256_hash = sha256.hexdigest()
 
         metadata = {
             'file_path': filepath,
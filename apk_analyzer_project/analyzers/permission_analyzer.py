@@ -26,10 +26,8 @@ def analyze_permissions(permissions_list):
             'error': 'Invalid input: permissions_list must be a list.'
         }
         
-    found_dangerous = []
-    for perm in permissions_list:
-        if perm in DANGEROUS_PERMISSIONS:
-            found_dangerous.append(perm)
+    # Sorted so the report order is stable across runs
+    found_dangerous = sorted(DANGEROUS_PERMISSIONS.intersection(permissions_list))
             
     return {
         'dangerous_permissions_found': found_dangerous,
@@ -1,7 +1,15 @@
 # analyzers/string_scanner.py
 import re
+from bisect import bisect_right
+from collections import Counter
 
-from androguard.core.bytecodes.apk import APK
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from androguard.core.apk import APK
+from androguard.core.dex import DEX
 
 # Regex to find URLs in strings
 URL_REGEX = r'(https?://[^\s/$.?#].[^\s]*)'
@@ -11,32 +19,114 @@ SUSPICIOUS_KEYWORDS = [
     'password', 'credit card', 'account', 'login', 'verify', 'update', 'security', 'bank'
 ]
 
-def scan_strings(filepath):
+URL_PATTERN = re.compile(URL_REGEX)
+
+def build_keyword_automaton(keywords):
+    """
+    Builds an Aho-Corasick automaton over the keywords, so a batch is scanned
+    in one pass whose cost does not grow with the number of keywords. Returns
+    None when pyahocorasick is not installed.
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+KEYWORD_AUTOMATON = build_keyword_automaton(SUSPICIOUS_KEYWORDS)
+
+# Approximate number of characters joined into one buffer before scanning
+BATCH_SIZE = 1 << 20
+
+def iter_string_batches(strings, batch_size=BATCH_SIZE):
+    """
+    Lowercases strings and joins them with newlines into buffers of roughly
+    batch_size characters. Yields (buffer, starts), where starts holds each
+    string's offset in the buffer. Keywords cannot span a newline, so matches
+    never cross strings.
+    """
+    batch, starts, size = [], [], 0
+    for string in strings:
+        string = string.lower()
+        batch.append(string)
+        starts.append(size)
+        size += len(string) + 1
+        if size >= batch_size:
+            yield '\n'.join(batch), starts
+            batch, starts, size = [], [], 0
+    if batch:
+        yield '\n'.join(batch), starts
+
+def iter_dex_strings(dex):
+    """
+    Decodes the DEX string pool one item at a time instead of materializing
+    the full list that dex.get_strings() builds.
+    """
+    for item in dex.get_string_data_item() or ():
+        yield item.get()
+
+def collect_urls(strings, urls_found, url_pattern=URL_PATTERN, url_markers=('http',)):
+    """
+    Passes strings through unchanged while adding any URLs they contain to the
+    urls_found set; the URL is url_pattern's first group. Most DEX strings hold
+    no URL, and `marker in string` is a C-level substring search (two-way/memchr
+    based), so only strings containing one of url_markers reach the regex engine.
+    """
+    for string in strings:
+        for marker in url_markers:
+            if marker in string:
+                urls_found.update(match.group(1) for match in url_pattern.finditer(string))
+                break
+        yield string
+
+def count_keywords(buffer, starts, keywords_found, keywords=SUSPICIOUS_KEYWORDS, automaton=KEYWORD_AUTOMATON):
+    """
+    Adds one count per string in buffer for each keyword that string contains,
+    the same as checking `keyword in string.lower()` per string. Overlapping
+    keywords are all found, whether the automaton built from keywords is
+    available or pyahocorasick is missing (automaton is None).
+    """
+    hits = set()
+    if automaton is not None:
+        for end, keyword in automaton.iter(buffer):
+            hits.add((bisect_right(starts, end), keyword))
+    else:
+        # str.find per keyword, jumping to the next string after each hit
+        for keyword in keywords:
+            position = buffer.find(keyword)
+            while position != -1:
+                string_index = bisect_right(starts, position)
+                hits.add((string_index, keyword))
+                if string_index == len(starts):
+                    break
+                position = buffer.find(keyword, starts[string_index])
+    keywords_found.update(keyword for _, keyword in hits)
+
+def scan_strings(filepath, apk=None):
     """
     Performs a basic string scan on the APK's DEX files to find URLs and keywords.
+    Pass an already parsed APK object to avoid parsing the file again.
     """
-    urls_found = []
-    keywords_found = {}
+    # Deduplicate URLs and count keywords as they are found
+    urls_found = set()
+    keywords_found = Counter()
 
     try:
-        apk = APK(filepath)
+        if apk is None:
+            apk = APK(filepath)
         
-        for dex in apk.get_dex():
-            for string in dex.get_strings():
-                # Find URLs
-                urls = re.findall(URL_REGEX, string)
-                if urls:
-                    urls_found.extend(urls)
-                
-                # Find Keywords
-                for keyword in SUSPICIOUS_KEYWORDS:
-                    if keyword in string.lower():
-                        keywords_found[keyword] = keywords_found.get(keyword, 0) + 1
+        # get_all_dex() yields raw bytes, so each DEX is parsed exactly once here
+        for dex in (DEX(raw) for raw in apk.get_all_dex()):
+            strings = collect_urls(iter_dex_strings(dex), urls_found)
+            for buffer, starts in iter_string_batches(strings):
+                count_keywords(buffer, starts, keywords_found)
                         
     except Exception as e:
         return {'error': f"Error during string scan: {e}"}
 
     return {
-        'urls_found': list(set(urls_found)), # Return unique URLs
-        'suspicious_keywords': keywords_found
+        'urls_found': list(urls_found), # Unique URLs
+        'suspicious_keywords': dict(keywords_found)
     }
@@ -1,22 +1,51 @@
 import os
-import subprocess
-import json
+import shutil
+import tempfile
+import zipfile
+import orjson
 from flask import Flask, request, jsonify
 from werkzeug.utils import secure_filename
 
+# Import the analysis pipeline once so androguard and the model are loaded
+# a single time per server process instead of on every request
+from run_analysis import analyze_apk_bytes, analyze_many
+
 # Initialize the Flask app
 app = Flask(__name__)
 
-# Configure a folder to temporarily store uploaded APKs
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Configure a folder to temporarily store uploaded APKs (used by the batch route).
+# Defaults to RAM-backed tmpfs so staged files never hit the disk; override with
+# APK_UPLOAD_DIR, and fall back to ./uploads where /dev/shm is not writable.
+def get_upload_folder():
+    folder = os.environ.get('APK_UPLOAD_DIR', '/dev/shm/apk_uploads')
+    try:
+        os.makedirs(folder, exist_ok=True)
+        if os.access(folder, os.W_OK):
+            return folder
+    except OSError:
+        pass
+    os.makedirs('uploads', exist_ok=True)
+    return 'uploads'
+
+UPLOAD_FOLDER = get_upload_folder()
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+def ojson(obj, status=200):
+    """
+    Like jsonify, but encodes with orjson, which is much faster on the large
+    URL and permission lists in analysis reports.
+    """
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
 @app.route('/analyze_apk', methods=['POST'])
 def analyze_apk_endpoint():
     """
     This is the API endpoint that the Flutter app will call.
-    It receives an APK file, saves it, runs your analysis script,
+    It receives an APK file, runs the analysis pipeline on it in memory,
     and returns the JSON report.
     """
     # 1. Check if a file was sent in the request
@@ -28,47 +57,71 @@ def analyze_apk_endpoint():
     if file.filename == '':
         return jsonify({'error': 'No file selected for uploading'}), 400
 
-    # 2. Save the uploaded file securely
+    # 2. Read the uploaded file into memory; it is never written to disk
     if file and file.filename.endswith('.apk'):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        apk_bytes = file.stream.read()
 
         try:
-            # 3. Call your standalone analysis script as a command-line tool
-            # This runs: python run_analysis.py /path/to/the/file.apk
-            result = subprocess.run(
-                ['python', 'run_analysis.py', filepath],
-                capture_output=True,
-                text=True,
-                check=True  # This will raise an error if the script fails
-            )
-            
-            # The output from your script is in result.stdout
-            analysis_json = json.loads(result.stdout)
+            # 3. Run the analysis pipeline in-process on the uploaded bytes
+            analysis_json = analyze_apk_bytes(apk_bytes)
             
-            # 4. Return the JSON report to the Flutter app
-            return jsonify(analysis_json)
+            # 4. Return the JSON report to the Flutter app; the pipeline reports
+            # APKs it could not parse or read as {'error': ...}
+            if 'error' in analysis_json:
+                return ojson(analysis_json, status=422)
+            return ojson(analysis_json)
 
-        except subprocess.CalledProcessError as e:
-            # If your script has an error, return that error
-            return jsonify({
-                'error': 'Analysis script failed.',
-                'details': e.stderr
-            }), 500
-        except json.JSONDecodeError:
-            # If the script output isn't valid JSON
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            # Failures the pipeline does not turn into an error report itself
+            # (known-apps database, classifier input, report cache I/O)
             return jsonify({
-                'error': 'Failed to decode analysis script output.',
-                'raw_output': result.stdout
+                'error': 'Analysis failed.',
+                'details': str(e)
             }), 500
-        finally:
-            # 5. Clean up by deleting the uploaded file
-            if os.path.exists(filepath):
-                os.remove(filepath)
     else:
         return jsonify({'error': 'Invalid file type, please upload an APK'}), 400
 
+@app.route('/analyze_apks_batch', methods=['POST'])
+def analyze_apks_batch_endpoint():
+    """
+    Receives several APK files under the 'files' field, analyzes them in
+    parallel worker processes, and returns one report per file.
+    """
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({'error': 'No files part in the request'}), 400
+
+    # Each request stages its files in a private directory, so concurrent
+    # batches uploading the same filename never touch each other's files
+    staging_dir = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+    try:
+        # One slot per upload, in upload order; rejected files are filled in now
+        results = [None] * len(files)
+        saved = {}
+        for index, file in enumerate(files):
+            if not file.filename or not file.filename.endswith('.apk'):
+                results[index] = {'filename': file.filename, 'error': 'Invalid file type, please upload an APK'}
+                continue
+            # Prefix with the upload index so identically named files don't overwrite each other
+            filepath = os.path.join(staging_dir, f"{index}_{secure_filename(file.filename)}")
+            file.save(filepath)
+            saved[filepath] = index
+
+        for filepath, report in analyze_many(saved):
+            index = saved[filepath]
+            results[index] = {'filename': files[index].filename, 'report': report}
+        return ojson({'results': results})
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Batch analysis failed.',
+            'details': str(e)
+        }), 500
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
 if __name__ == '__main__':
-    # This server script runs without any command-line arguments.
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Local development only. In production run under gunicorn, which uses
+    # gunicorn.conf.py to preload this module once and fork the workers:
+    #   gunicorn api_server:app
+    app.run(host='0.0.0.0', port=5001)
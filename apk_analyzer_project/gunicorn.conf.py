@@ -0,0 +1,13 @@
+# gunicorn.conf.py
+# Used by: gunicorn api_server:app
+import os
+
+bind = '0.0.0.0:5001'
+
+# One worker per core. preload_app imports api_server (androguard and the
+# classifier) once in the master, and the forked workers share it copy-on-write.
+workers = os.cpu_count() or 1
+preload_app = True
+
+# Large APKs can take minutes to parse and scan
+timeout = 300
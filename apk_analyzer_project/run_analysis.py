@@ -8,6 +8,10 @@ import numpy as np
 import requests
 import re 
 import logging
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Configure the androguard logger to be less verbose before importing
@@ -15,38 +19,43 @@ log = logging.getLogger('androguard')
 log.setLevel(logging.CRITICAL)
 
 from androguard.core.apk import APK
+from androguard.core.dex import DEX
+
+from analyzers.string_scanner import build_keyword_automaton, collect_urls, count_keywords, iter_dex_strings, iter_string_batches
 
 # ==============================================================================
 # STRING SCANNER LOGIC
 # ==============================================================================
+URL_REGEX = r'\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:\'".,<>?«»“”‘’]))'
+SUSPICIOUS_KEYWORDS = ['password', 'credit card', 'account', 'login', 'verify', 'update', 'security', 'bank', 'ssn', 'social security']
+URL_PATTERN = re.compile(URL_REGEX, re.IGNORECASE)
+# Every URL_REGEX branch needs '://' or a '.', so strings with neither skip the regex
+URL_MARKERS = ('.', '://')
+
+KEYWORD_AUTOMATON = build_keyword_automaton(SUSPICIOUS_KEYWORDS)
+
 def scan_strings(apk_object):
-    urls_found = []
-    keywords_found = {}
-    URL_REGEX = r'(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:\'".,<>?«»“”‘’]))'
-    SUSPICIOUS_KEYWORDS = ['password', 'credit card', 'account', 'login', 'verify', 'update', 'security', 'bank', 'ssn', 'social security']
+    urls_found = set()
+    keywords_found = Counter()
     try:
-        all_strings = []
-        for dex in apk_object.get_dex():
-            if hasattr(dex, 'get_strings'):
-                all_strings.extend(dex.get_strings())
-        for string in all_strings:
-            urls = re.findall(URL_REGEX, string)
-            if urls:
-                urls_found.extend([url[0] for url in urls])
-            for keyword in SUSPICIOUS_KEYWORDS:
-                if keyword in string.lower():
-                    keywords_found[keyword] = keywords_found.get(keyword, 0) + 1
+        # get_all_dex() yields raw bytes, so each DEX is parsed exactly once here
+        for raw_dex in apk_object.get_all_dex():
+            strings = collect_urls(iter_dex_strings(DEX(raw_dex)), urls_found, URL_PATTERN, URL_MARKERS)
+            for buffer, starts in iter_string_batches(strings):
+                count_keywords(buffer, starts, keywords_found, SUSPICIOUS_KEYWORDS, KEYWORD_AUTOMATON)
     except Exception as e:
         return {'error': f"Error during string scan: {e}"}
-    return {'urls_found': list(set(urls_found)), 'suspicious_keywords': keywords_found}
+    return {'urls_found': list(urls_found), 'suspicious_keywords': dict(keywords_found)}
 
 # ==============================================================================
 # VIRUSTOTAL ANALYZER LOGIC
 # ==============================================================================
+VT_NO_API_KEY_ERROR = "VirusTotal API key not found."
+
 def get_virustotal_report(file_hash):
     api_key = os.environ.get("VIRUSTOTAL_API_KEY")
     if not api_key:
-        return {"error": "VirusTotal API key not found."}
+        return {"error": VT_NO_API_KEY_ERROR}
     url = f"https://www.virustotal.com/api/v3/files/{file_hash}"
     headers = {"x-apikey": api_key}
     try:
@@ -68,10 +77,14 @@ def get_virustotal_report(file_hash):
 # ==============================================================================
 # METADATA EXTRACTOR LOGIC
 # ==============================================================================
-def extract_metadata(filepath, apk_object):
+def file_sha256(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def extract_metadata(filepath, apk_object, sha256_hash=None):
     try:
-        with open(filepath, 'rb') as f:
-            sha256_hash = hashlib.sha256(f.read()).hexdigest()
+        if sha256_hash is None:
+            sha256_hash = file_sha256(filepath)
         cert_data_list = apk_object.get_certificates_der_v2() or apk_object.get_certificates_der()
         signature_sha256 = hashlib.sha256(cert_data_list[0]).hexdigest() if cert_data_list else "N/A"
         return {
@@ -179,16 +192,54 @@ def calculate_risk(analysis_results):
 # ==============================================================================
 # MAIN ANALYSIS PIPELINE
 # ==============================================================================
+# Finished reports are stored on disk as <sha256>.json, so re-submitted files skip the
+# whole pipeline in every gunicorn worker and analyze_many process, and across restarts.
+# Entries expire after REPORT_CACHE_TTL seconds because VirusTotal verdicts change
+REPORT_CACHE_DIR = os.environ.get('APK_REPORT_CACHE_DIR', 'report_cache')
+REPORT_CACHE_TTL = 24 * 60 * 60
+
+def _cached_report(sha256_hash):
+    path = os.path.join(REPORT_CACHE_DIR, f"{sha256_hash}.json")
+    try:
+        if time.time() - os.path.getmtime(path) > REPORT_CACHE_TTL:
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _store_report(sha256_hash, report):
+    # Write to a temp file and rename it into place, so concurrent readers never see a partial report
+    try:
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(report, f)
+        os.replace(tmp_path, os.path.join(REPORT_CACHE_DIR, f"{sha256_hash}.json"))
+    except (OSError, TypeError, ValueError):
+        pass  # Caching is best-effort; the report is still returned
+
 def analyze_apk(file_path):
     if not os.path.exists(file_path):
         return {"error": f"File not found at: {file_path}"}
+    return _analyze(file_path, file_sha256(file_path), raw=False)
+
+def analyze_apk_bytes(apk_bytes):
+    """Analyzes an APK that is already in memory (e.g. an upload) without writing it to disk."""
+    return _analyze(apk_bytes, hashlib.sha256(apk_bytes).hexdigest(), raw=True)
+
+def _analyze(apk_source, sha256_hash, raw):
+    cached_report = _cached_report(sha256_hash)
+    if cached_report is not None:
+        return {**cached_report, 'cache_hit': True}
+
     try:
-        apk_object = APK(file_path)
+        apk_object = APK(apk_source, raw=raw)
     except Exception as e:
         return {'error': f"Could not process APK file: {e}"}
 
     full_analysis = {}
-    metadata = extract_metadata(file_path, apk_object)
+    metadata = extract_metadata(None if raw else apk_source, apk_object, sha256_hash)
     if 'error' in metadata: return metadata
     full_analysis['metadata'] = metadata
 
@@ -219,10 +270,26 @@ def analyze_apk(file_path):
             'virustotal': full_analysis.get('virustotal'),
             'string_analysis': full_analysis.get('string_analysis'),
             'clone_analysis': full_analysis.get('clone_analysis')
-        }
+        },
+        'cache_hit': False
     }
+    # A VirusTotal lookup that failed transiently (connection error, unexpected status) is
+    # retried on the next submission rather than cached; a missing API key is not transient
+    vt_error = final_report['details']['virustotal'].get('error')
+    if vt_error is None or vt_error == VT_NO_API_KEY_ERROR:
+        _store_report(sha256_hash, final_report)
     return final_report
 
+def analyze_many(file_paths, workers=None):
+    """
+    Analyzes a batch of APKs across worker processes and yields
+    (file_path, report) pairs in input order. Files are handed out one at a
+    time so a single large APK does not hold up a whole pre-split chunk.
+    """
+    file_paths = list(file_paths)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        yield from zip(file_paths, executor.map(analyze_apk, file_paths, chunksize=1))
+
 if __name__ == '__main__':
     try:
         parser = argparse.ArgumentParser(description="Complete APK Analyzer with weighted scoring.")
@@ -1,28 +1,66 @@
+import argparse
 import pickle
 import json
 import os
 import glob
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from sklearn.metrics import classification_report, confusion_matrix
-import seaborn as sns
-import matplotlib.pyplot as plt
 
 # ==============================================================================
 # MODEL EVALUATION SCRIPT
 # ==============================================================================
 
-def evaluate_model():
+def dedupe_column_names(names):
+    """
+    Renames repeated CSV headers the way pandas does (' Fwd Header Length.1'),
+    so arrow-loaded columns line up with the names saved in features.json.
+    """
+    seen = {}
+    deduped = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            deduped.append(f"{name}.{seen[name]}")
+        else:
+            seen[name] = 0
+            deduped.append(name)
+    return deduped
+
+def load_onnx_session(path="apk_classifier.onnx"):
+    """
+    Returns an ONNX Runtime session for the exported classifier, or None if
+    the ONNX file or onnxruntime is missing so the pickled model is used instead.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        import onnxruntime
+    except ImportError:
+        return None
+    return onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+def evaluate_model(plot=True):
     """
     Loads the trained model, the full dataset, and evaluates the model's
     performance with a detailed report and a confusion matrix visualization.
+    Pass plot=False (e.g. for CI) to print the metrics only and skip
+    importing matplotlib/seaborn entirely.
     """
     print("--- Starting Model Evaluation ---")
 
     # --- 1. Load the Trained Model and Feature List ---
-    print("Loading 'apk_classifier.pkl' and 'features.json'...")
+    print("Loading the classifier and 'features.json'...")
     try:
-        with open("apk_classifier.pkl", "rb") as f:
-            model = pickle.load(f)
+        model = None
+        session = load_onnx_session()
+        if session is not None:
+            print("Using the ONNX Runtime model from 'apk_classifier.onnx'.")
+        else:
+            with open("apk_classifier.pkl", "rb") as f:
+                model = pickle.load(f)
         with open("features.json", "r") as f:
             feature_list = json.load(f)
     except FileNotFoundError:
@@ -34,23 +72,26 @@ def evaluate_model():
     # This uses the same logic as train_model.py to ensure consistency.
     print("Loading the full dataset for testing...")
     try:
-        data_frames = []
+        tables = []
         base_path = 'dataset'
         categories = {
             'Adware': 'malware', 'Benign': 'benign', 'Ransomware': 'malware',
             'Scareware': 'malware', 'SMSmalware': 'malware'
         }
+        read_options = pacsv.ReadOptions(block_size=1 << 20)
+        parse_options = pacsv.ParseOptions(invalid_row_handler=lambda row: 'skip')
         for category, label in categories.items():
             folder_path = os.path.join(base_path, category)
             all_csv_files = glob.glob(f"{folder_path}/**/*.csv", recursive=True)
             for f in all_csv_files:
                 try:
-                    df_temp = pd.read_csv(f, encoding='utf-8', on_bad_lines='skip')
-                    df_temp['class'] = label
-                    data_frames.append(df_temp)
+                    table = pacsv.read_csv(f, read_options=read_options, parse_options=parse_options)
+                    table = table.rename_columns(dedupe_column_names(table.column_names))
+                    tables.append(table.append_column('class', pa.array([label] * table.num_rows)))
                 except Exception:
                     continue 
-        df = pd.concat(data_frames, ignore_index=True)
+        # A single concat at the end; 'permissive' widens e.g. int64 columns that are double in other files
+        df = pa.concat_tables(tables, promote_options='permissive').to_pandas()
         # Drop any rows with missing data and the old 'Label' column if it exists
         df = df.dropna().drop(columns=['Label'], errors='ignore')
     except Exception as e:
@@ -60,22 +101,36 @@ def evaluate_model():
     # --- 3. Prepare the Data for Prediction ---
     # Ensure the test data has the same columns in the same order as the training data.
     print("Preparing feature vectors...")
-    df_features = pd.DataFrame(columns=feature_list)
-    df_combined = pd.concat([df_features, df], ignore_index=True, sort=False).fillna(0)
-    
-    X_test = df_combined[feature_list]
-    y_true = df_combined['class']
+    # Missing feature columns are filled with 0 in one reindex, without copying through a concat.
+    # Tree predictors evaluate in float32, so downcast once here instead of inside every predict.
+    X_test = df.reindex(columns=feature_list, fill_value=0).to_numpy(dtype=np.float32)
+    y_true = df['class']
 
     # --- 4. Make Predictions ---
     print("Making predictions on the full dataset...")
-    y_pred = model.predict(X_test)
+    if session is not None:
+        input_name = session.get_inputs()[0].name
+        y_pred = session.run(None, {input_name: X_test})[0]
+    else:
+        y_pred = model.predict(X_test)
 
     # --- 5. Show Evaluation Metrics ---
     print("\n✅ --- Evaluation Report --- ✅")
     print("This report shows how well the model performed on the full dataset.\n")
     print(classification_report(y_true, y_pred, target_names=['benign', 'malware']))
 
+    if not plot:
+        print("---------------------------------")
+        return
+
     # --- 6. Generate and Save Confusion Matrix ---
+    # Imported here so metric-only runs never pay for matplotlib/seaborn.
+    # The Agg backend is forced before pyplot loads to skip GUI backend detection.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     print("Generating confusion matrix visualization...")
     cm = confusion_matrix(y_true, y_pred, labels=['benign', 'malware'])
     plt.figure(figsize=(8, 6))
@@ -93,5 +148,8 @@ def evaluate_model():
 
 
 if __name__ == '__main__':
-    evaluate_model()
+    parser = argparse.ArgumentParser(description="Evaluate the trained APK classifier on the full dataset.")
+    parser.add_argument("--no-plot", action="store_true", help="Skip the confusion matrix image.")
+    args = parser.parse_args()
+    evaluate_model(plot=not args.no_plot)
 
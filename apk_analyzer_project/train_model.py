@@ -133,6 +133,22 @@ def train_model():
     with open('scaler.pkl', 'wb') as f:
         pickle.dump(scaler, f)
         
+    # --- STEP 6: EXPORT AN ONNX COPY FOR FAST INFERENCE ---
+    # test_model.py prefers this file when onnxruntime is installed.
+    try:
+        from onnxmltools import convert_lightgbm
+        from onnxmltools.convert.common.data_types import FloatTensorType
+        onnx_model = convert_lightgbm(
+            model,
+            initial_types=[('X', FloatTensorType([None, len(features)]))],
+            zipmap=False
+        )
+        with open('apk_classifier.onnx', 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+        print("ONNX model saved to 'apk_classifier.onnx'.")
+    except ImportError:
+        print("Warning: onnxmltools is not installed. Skipping ONNX export.")
+        
     print("✅ Training complete. All necessary files have been saved.")
     print("---------------------------------------------------------")
 
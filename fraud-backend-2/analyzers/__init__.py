@@ -1,10 +1,14 @@
 """
 Analyzers package for URL fraud detection
+
+Submodules are imported on first use, so importing the package (or one
+light analyzer) doesn't load OpenCV/Selenium or the ML models.
 """
-from . import domain_analyzer
-from . import content_analyzer
-from . import reputation_analyzer
-from . import visual_analyzer
-from . import network_analyzer
+import importlib
+
+__all__ = ['domain_analyzer', 'content_analyzer', 'reputation_analyzer', 'visual_analyzer', 'network_analyzer']
 
-__all__ = ['domain_analyzer', 'content_analyzer', 'reputation_analyzer', 'visual_analyzer']
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,75 @@
+# analyzers/common.py
+"""
+URL parsing shared by the analyzers, so a URL is split and its registrable
+domain extracted once per analysis instead of once per analyzer, and the
+outbound HTTP session setup they share.
+"""
+
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import tldextract
+
+# Offline extractor (bundled public suffix snapshot) - never hits the network
+extract = tldextract.TLDExtract(suffix_list_urls=())
+
+# Outbound HTTP: pooled keep-alive connections; connection errors and 5xx are
+# retried with a short backoff. 429 is not retried - a rate-limited call is
+# reported straight back instead of holding a request thread through Retry-After
+HTTP_POOL_SIZE = 64
+HTTP_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504),
+                   raise_on_status=False)
+
+def build_http_session() -> requests.Session:
+    """
+    Returns a requests.Session with the pooled, retrying adapter mounted on
+    http:// and https://. It carries no default headers, so API keys are sent
+    per request and never leak to other hosts fetched through the same session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+                          max_retries=HTTP_RETRY)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+@dataclass(slots=True, frozen=True)
+class ParsedUrl:
+    url: str
+    scheme: str
+    netloc: str       # lowercased host[:port]
+    subdomain: str    # e.g. 'www.mail'
+    domain_name: str  # e.g. 'example'
+    suffix: str       # e.g. 'co.uk'
+    registrable: str  # e.g. 'example.co.uk' (netloc when there is no public suffix)
+
+def registrable_domain(host: str) -> str:
+    """Return the registrable part of a host (e.g. www.mail.example.co.uk -> example.co.uk)"""
+    extracted = extract(host)
+    if extracted.domain and extracted.suffix:
+        return f"{extracted.domain}.{extracted.suffix}"
+    return host.lower()
+
+def parse_url(url) -> ParsedUrl:
+    """Parses a URL string into a ParsedUrl; a ParsedUrl is returned unchanged."""
+    if isinstance(url, ParsedUrl):
+        return url
+
+    split = urlsplit(url)
+    netloc = split.netloc.lower()
+    extracted = extract(netloc)
+    if extracted.domain and extracted.suffix:
+        registrable = f"{extracted.domain}.{extracted.suffix}"
+    else:
+        registrable = netloc
+    return ParsedUrl(
+        url=url,
+        scheme=split.scheme,
+        netloc=netloc,
+        subdomain=extracted.subdomain,
+        domain_name=extracted.domain,
+        suffix=extracted.suffix,
+        registrable=registrable,
+    )
@@ -21,6 +21,28 @@ except (ImportError, FileNotFoundError):
     model = None
     vectorizer = None
 
+# Patterns and keyword tables are built once at import instead of on every URL
+_DIGIT_RE = re.compile(r'\d')
+_IP_RE = re.compile(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b')
+
+# Kept as a tuple so suspicious_keywords_found preserves this order
+PHISHING_KEYWORDS = (
+    'verify', 'confirm', 'update', 'suspend', 'secure', 'alert',
+    'warning', 'expire', 'lock', 'urgent', 'immediate', 'action',
+    'account', 'billing', 'payment', 'signin', 'login', 'auth'
+)
+SUSPICIOUS_PARAMS = ('redirect', 'url', 'link', 'goto', 'target', 'continue')
+SHORTENER_DOMAINS = frozenset([
+    'bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly',
+    'short.link', 'tiny.cc', 'is.gd', 'buff.ly'
+])
+SUSPICIOUS_TLDS = frozenset(['tk', 'ml', 'ga', 'cf', 'pw', 'top', 'click'])
+BRANDS = (
+    'paypal', 'amazon', 'microsoft', 'google', 'apple', 'facebook',
+    'netflix', 'spotify', 'instagram', 'twitter', 'linkedin', 'ebay'
+)
+_SAFE_URL_CHARS = frozenset(string.ascii_letters + string.digits + '.-_/?&=:')
+
 def analyze_url_patterns(url):
     """Analyze URL patterns for phishing indicators"""
     features = {}
@@ -37,28 +59,18 @@ def analyze_url_patterns(url):
         query = parsed.query.lower()
         
         # Suspicious keywords in URL
-        phishing_keywords = [
-            'verify', 'confirm', 'update', 'suspend', 'secure', 'alert',
-            'warning', 'expire', 'lock', 'urgent', 'immediate', 'action',
-            'account', 'billing', 'payment', 'signin', 'login', 'auth'
-        ]
-        
         full_url_lower = url.lower()
 
-         # Find and store the actual keywords found in the URL
-        found_keywords = [keyword for keyword in phishing_keywords if keyword in full_url_lower]
+        # Find and store the actual keywords found in the URL
+        found_keywords = [keyword for keyword in PHISHING_KEYWORDS if keyword in full_url_lower]
         features['phishing_keywords'] = len(found_keywords)
         features['suspicious_keywords_found'] = found_keywords # Store the list
         features['has_phishing_keywords'] = len(found_keywords) > 0
-
-        keyword_count = sum(1 for keyword in phishing_keywords if keyword in full_url_lower)
-        features['phishing_keywords'] = keyword_count
-        features['has_phishing_keywords'] = keyword_count > 0
         
         # Domain analysis
         features['domain_length'] = len(domain)
         features['has_subdomain'] = len(domain.split('.')) > 2
-        features['domain_has_numbers'] = bool(re.search(r'\d', domain))
+        features['domain_has_numbers'] = bool(_DIGIT_RE.search(domain))
         features['domain_has_hyphens'] = '-' in domain
         
         # Path analysis
@@ -72,42 +84,29 @@ def analyze_url_patterns(url):
             features['query_param_count'] = len(params)
             
             # Suspicious query parameters
-            suspicious_params = ['redirect', 'url', 'link', 'goto', 'target', 'continue']
-            features['suspicious_params'] = any(param in query for param in suspicious_params)
+            features['suspicious_params'] = any(param in query for param in SUSPICIOUS_PARAMS)
         else:
             features['query_param_count'] = 0
             features['suspicious_params'] = False
         
         # URL shortener patterns
-        shortener_domains = [
-            'bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly', 
-            'short.link', 'tiny.cc', 'is.gd', 'buff.ly'
-        ]
-        features['is_shortener'] = domain in shortener_domains
+        features['is_shortener'] = domain in SHORTENER_DOMAINS
         
         # Suspicious TLD
         tld = domain.split('.')[-1] if '.' in domain else ''
-        suspicious_tlds = ['tk', 'ml', 'ga', 'cf', 'pw', 'top', 'click']
-        features['suspicious_tld'] = tld in suspicious_tlds
+        features['suspicious_tld'] = tld in SUSPICIOUS_TLDS
         
         # IP address instead of domain
-        ip_pattern = r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'
-        features['uses_ip'] = bool(re.search(ip_pattern, domain))
+        features['uses_ip'] = bool(_IP_RE.search(domain))
         
         # Special characters
-        special_chars = set(url) - set(string.ascii_letters + string.digits + '.-_/?&=:')
+        special_chars = set(url) - _SAFE_URL_CHARS
         features['special_char_count'] = len(special_chars)
         features['has_special_chars'] = len(special_chars) > 5
         
-        # Brand impersonation
-        brands = [
-            'paypal', 'amazon', 'microsoft', 'google', 'apple', 'facebook',
-            'netflix', 'spotify', 'instagram', 'twitter', 'linkedin', 'ebay'
-        ]
-        
         # Check for brand names in suspicious contexts
         brand_impersonation = False
-        for brand in brands:
+        for brand in BRANDS:
             if brand in domain:
                 # Check if it's the real domain
                 real_domains = [f'{brand}.com', f'www.{brand}.com']
@@ -191,15 +190,41 @@ def calculate_content_risk_score(features):
     
     return min(max(risk_score, 0.0), 1.0)
 
+def _model_result(pattern_features, prediction, probability):
+    """Builds the result dict for a URL scored by the trained model"""
+    # Get probability of phishing class (class 1)
+    phishing_prob = probability[1] if len(probability) > 1 else probability[0]
+    return {
+        "content_risk_prediction": int(prediction),
+        "content_risk_score": round(phishing_prob, 3),
+        "pattern_features": pattern_features,
+        "model_used": True
+    }
+
+def _rule_based_result(pattern_features, **extra):
+    """Builds the result dict for a URL scored by the rule-based fallback"""
+    risk_score = calculate_content_risk_score(pattern_features)
+    result = {
+        "content_risk_prediction": 1 if risk_score > 0.5 else 0,
+        "content_risk_score": round(risk_score, 3),
+        "pattern_features": pattern_features,
+        "model_used": False
+    }
+    result.update(extra)
+    return result
+
+def _invalid_url_result():
+    return {
+        "error": "Invalid URL provided",
+        "content_risk_prediction": 0,
+        "content_risk_score": 0.5
+    }
+
 def get_features(url: str) -> dict:
     """Analyzes the URL string and returns a risk score"""
     
     if not url or not isinstance(url, str):
-        return {
-            "error": "Invalid URL provided",
-            "content_risk_prediction": 0,
-            "content_risk_score": 0.5
-        }
+        return _invalid_url_result()
     
     try:
         # Analyze URL patterns
@@ -215,36 +240,14 @@ def get_features(url: str) -> dict:
                 prediction = model.predict(url_features)
                 probability = model.predict_proba(url_features)[0]
                 
-                # Get probability of phishing class (class 1)
-                phishing_prob = probability[1] if len(probability) > 1 else probability[0]
-                
-                result = {
-                    "content_risk_prediction": int(prediction[0]),
-                    "content_risk_score": round(phishing_prob, 3),
-                    "pattern_features": pattern_features,
-                    "model_used": True
-                }
+                result = _model_result(pattern_features, prediction[0], probability)
                 
             except Exception as model_error:
                 # Fallback to rule-based scoring if model fails
-                risk_score = calculate_content_risk_score(pattern_features)
-                result = {
-                    "content_risk_prediction": 1 if risk_score > 0.5 else 0,
-                    "content_risk_score": round(risk_score, 3),
-                    "pattern_features": pattern_features,
-                    "model_used": False,
-                    "model_error": str(model_error)
-                }
+                result = _rule_based_result(pattern_features, model_error=str(model_error))
         else:
             # No model available - use rule-based scoring
-            risk_score = calculate_content_risk_score(pattern_features)
-            result = {
-                "content_risk_prediction": 1 if risk_score > 0.5 else 0,
-                "content_risk_score": round(risk_score, 3),
-                "pattern_features": pattern_features,
-                "model_used": False,
-                "model_status": "not_available"
-            }
+            result = _rule_based_result(pattern_features, model_status="not_available")
         
         return result
         
@@ -255,4 +258,43 @@ def get_features(url: str) -> dict:
             "content_risk_prediction": 0,
             "content_risk_score": 0.1,
             "analysis_method": "error_fallback"
-        }
\ No newline at end of file
+        }
+
+def get_features_batch(urls: list) -> list:
+    """
+    Analyzes a list of URL strings and returns one result per URL, in order.
+    All valid URLs go through the vectorizer and model in a single call.
+    """
+    results = [None] * len(urls)
+    valid = [(i, url) for i, url in enumerate(urls) if url and isinstance(url, str)]
+    for i, url in enumerate(urls):
+        if not url or not isinstance(url, str):
+            results[i] = _invalid_url_result()
+    
+    try:
+        pattern_features = [analyze_url_patterns(url) for _, url in valid]
+        
+        if valid and model is not None and vectorizer is not None:
+            try:
+                url_features = vectorizer.transform([url for _, url in valid])
+                predictions = model.predict(url_features)
+                probabilities = model.predict_proba(url_features)
+                for (i, _), features, prediction, probability in zip(valid, pattern_features, predictions, probabilities):
+                    results[i] = _model_result(features, prediction, probability)
+            except Exception as model_error:
+                for (i, _), features in zip(valid, pattern_features):
+                    results[i] = _rule_based_result(features, model_error=str(model_error))
+        else:
+            for (i, _), features in zip(valid, pattern_features):
+                results[i] = _rule_based_result(features, model_status="not_available")
+        
+    except Exception as e:
+        for i, _ in valid:
+            results[i] = {
+                "error": f"Content analysis failed: {str(e)}",
+                "content_risk_prediction": 0,
+                "content_risk_score": 0.1,
+                "analysis_method": "error_fallback"
+            }
+    
+    return results
@@ -1,27 +1,229 @@
 # analyzers/domain_analyzer.py (Fixed with proper error handling)
 
 import os
+import numpy as np
 import pandas as pd
 from urllib.parse import urlparse
 from datetime import datetime
-import tldextract
 import re
+import math
+import threading
+import warnings
+from collections import Counter
+from cachetools import TTLCache
+
+from .common import ParsedUrl, extract, parse_url, registrable_domain
+from .reputation_analyzer import is_whitelisted
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import whois
+except ImportError:
+    whois = None
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 try:
     import joblib
-    model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'domain_model.joblib')
-    if os.path.exists(model_path):
-        model = joblib.load(model_path)
-    else:
-        model = None
-except (ImportError, FileNotFoundError):
-    model = None
+except ImportError:
+    joblib = None
+
+model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'domain_model.joblib')
+
+# Loaded on first prediction rather than at import (see _get_model)
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def _get_model():
+    """
+    Loads the domain model once, on first use. Arrays inside the estimator are
+    memory-mapped, so forked workers share the same physical pages.
+    Returns None when joblib or the model file is missing, or when the model
+    was trained on other columns than MODEL_FEATURES.
+    """
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                if joblib is not None and os.path.exists(model_path):
+                    try:
+                        _model = joblib.load(model_path, mmap_mode='r')
+                    except FileNotFoundError:
+                        _model = None
+                    # Checked once here, so predictions can use plain arrays in MODEL_FEATURES order
+                    trained_features = getattr(_model, 'feature_names_in_', None)
+                    if trained_features is not None and tuple(trained_features) != MODEL_FEATURES:
+                        warnings.warn(f"Domain model was trained on {list(trained_features)}, "
+                                      f"expected {list(MODEL_FEATURES)}; using rule-based scoring")
+                        _model = None
+                _model_loaded = True
+    return _model
+
+# Column order the domain model was trained with
+MODEL_FEATURES = ('domain_age', 'has_ssl', 'domain_length')
+
+# Heuristic: newer domains often have numbers or suspicious patterns
+_SUSPICIOUS_PATTERNS = [
+    re.compile(r'\d{4}'),  # Year in domain (often recent)
+    re.compile(r'-\d+$'),  # Ends with dash and numbers
+    re.compile(r'\d{2,}'),  # Multiple consecutive digits
+]
+_DIGIT_RE = re.compile(r'\d')
+
+# Hyperscan databases hold scan scratch space that cannot be shared between
+# concurrent scans, so each thread compiles its own copy on first use
+_hs_local = threading.local()
+
+def _suspicious_pattern_db():
+    db = getattr(_hs_local, 'db', None)
+    if db is None:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[pattern.pattern.encode() for pattern in _SUSPICIOUS_PATTERNS],
+            ids=list(range(len(_SUSPICIOUS_PATTERNS))),
+            elements=len(_SUSPICIOUS_PATTERNS),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(_SUSPICIOUS_PATTERNS),
+        )
+        _hs_local.db = db
+    return db
+
+def has_suspicious_pattern(domain):
+    """True if any of _SUSPICIOUS_PATTERNS matches the domain"""
+    if hyperscan is not None:
+        matches = []
+        _suspicious_pattern_db().scan(domain.encode(), match_event_handler=lambda *args: matches.append(args[0]))
+        return bool(matches)
+    return any(pattern.search(domain) for pattern in _SUSPICIOUS_PATTERNS)
+
+# Well-known old domains (substring match in estimate_domain_age)
+OLD_DOMAINS = (
+    'google', 'yahoo', 'microsoft', 'apple', 'amazon',
+    'facebook', 'twitter', 'wikipedia', 'github', 'stackoverflow'
+)
+
+SUSPICIOUS_TLDS = frozenset(['tk', 'ml', 'ga', 'cf', 'pw', 'top', 'click', 'download', 'space'])
+BRAND_KEYWORDS = (
+    'paypal', 'amazon', 'microsoft', 'google', 'apple', 'facebook',
+    'netflix', 'spotify', 'instagram', 'twitter', 'linkedin'
+)
+SHORTENERS = frozenset(['bit.ly', 'tinyurl', 't.co', 'goo.gl', 'ow.ly', 'short.link'])
+
+def _build_brand_automaton(brands):
+    """
+    Builds an Aho-Corasick automaton over the brand keywords, so a domain is
+    checked for all brands in one pass.
+    """
+    automaton = ahocorasick.Automaton()
+    for brand in brands:
+        automaton.add_word(brand, ('brand', brand))
+    automaton.make_automaton()
+    return automaton
+
+BRAND_AUTOMATON = _build_brand_automaton(BRAND_KEYWORDS) if ahocorasick else None
+
+def find_brands(text):
+    """Returns the brand keywords contained in text (lowercase)"""
+    if BRAND_AUTOMATON is not None:
+        return {name for _, (kind, name) in BRAND_AUTOMATON.iter(text) if kind == 'brand'}
+    return {brand for brand in BRAND_KEYWORDS if brand in text}
+
+# WHOIS answers barely change day to day, so share them across requests.
+# Only real WHOIS answers are stored - a failed lookup is retried next time
+DOMAIN_AGE_CACHE = TTLCache(maxsize=10_000, ttl=86400)
+_domain_age_lock = threading.Lock()
+
+def _entropy_u8(arr):
+    """Shannon entropy of a uint8 array (byte histogram, then -sum(p*log2(p)))"""
+    counts = np.zeros(256, dtype=np.int64)
+    for byte in arr:
+        counts[byte] += 1
+    n = arr.shape[0]
+    entropy = 0.0
+    for count in counts:
+        if count > 0:
+            p = count / n
+            entropy -= p * math.log2(p)
+    return entropy
+
+# Columns of the feature matrix consumed by _risk_from_matrix, with the
+# defaults used when a feature is missing
+RISK_FEATURES = (
+    ('domain_age', -1), ('has_ssl', True), ('suspicious_tld', False),
+    ('brand_impersonation', False), ('is_shortener', False), ('domain_length', 0),
+    ('hyphen_count', 0), ('domain_entropy', 0), ('subdomain_count', 0),
+)
+
+def _risk_from_matrix(m):
+    """
+    Rule-based risk scores for an (N, len(RISK_FEATURES)) float64 matrix in
+    RISK_FEATURES column order - the single source of the scoring rules for
+    both the per-domain and the batch path.
+    """
+    # Age-based risk
+    domain_age = m[:, 0]
+    unknown_age = domain_age == -1
+    risk = 0.1 * unknown_age  # Unknown age penalty
+    risk += 0.4 * (~unknown_age & (domain_age < 30))  # Very new domain
+    risk += 0.2 * ((domain_age >= 30) & (domain_age < 90))  # New domain
+    risk -= 0.1 * (domain_age > 365 * 2)  # Old domain bonus
+    
+    # SSL check
+    risk += 0.3 * (m[:, 1] == 0)
+    
+    # Domain structure risks: suspicious TLD, brand impersonation, shortener
+    risk += 0.3 * (m[:, 2] != 0)
+    risk += 0.4 * (m[:, 3] != 0)
+    risk += 0.2 * (m[:, 4] != 0)
+    
+    # Length and complexity
+    domain_length = m[:, 5]
+    risk += 0.2 * (domain_length > 50)
+    risk += 0.1 * (domain_length < 5)
+    
+    # Hyphen abuse
+    hyphen_count = m[:, 6]
+    risk += 0.2 * (hyphen_count > 2)
+    risk += 0.1 * ((hyphen_count > 0) & (hyphen_count <= 2))
+    
+    # High entropy (random strings)
+    risk += 0.15 * (m[:, 7] > 3.5)
+    
+    # Subdomain abuse
+    risk += 0.1 * (m[:, 8] > 2)
+    
+    return np.minimum(np.maximum(risk, 0.0), 1.0)
+
+# Compile the per-domain arithmetic to native code when numba is installed
+if njit is not None:
+    _entropy_u8 = njit(cache=True)(_entropy_u8)
+    _risk_from_matrix = njit(cache=True)(_risk_from_matrix)
 
 def get_domain_age(domain):
-    """Get domain age with multiple fallbacks"""
+    """Get domain age with multiple fallbacks (WHOIS answers cached per registrable domain)"""
+    if whois is None:
+        return estimate_domain_age(domain)
+    
+    key = registrable_domain(domain)
+    with _domain_age_lock:
+        age = DOMAIN_AGE_CACHE.get(key)
+    if age is not None:
+        return age
+    
     try:
         # Try python-whois first
-        import whois
         w = whois.whois(domain)
         creation_date = w.creation_date
         
@@ -29,85 +231,73 @@ def get_domain_age(domain):
             creation_date = creation_date[0] if creation_date else None
         
         if creation_date:
-            age = (datetime.now() - creation_date).days
-            return max(age, 0)  # Ensure non-negative
+            age = max((datetime.now() - creation_date).days, 0)  # Ensure non-negative
         else:
-            return -1
-    except:
-        # Fallback: estimate based on domain patterns
+            age = -1
+    except (whois.parser.PywhoisError, OSError, ValueError, TypeError):
+        # WHOIS lookup failed (network, parse error or odd creation_date)
+        # Fallback: estimate based on domain patterns - not cached
         return estimate_domain_age(domain)
+    
+    with _domain_age_lock:
+        DOMAIN_AGE_CACHE[key] = age
+    return age
 
 def estimate_domain_age(domain):
     """Estimate domain age based on patterns (fallback method)"""
     try:
-        # Heuristic: newer domains often have numbers or suspicious patterns
-        suspicious_patterns = [
-            r'\d{4}',  # Year in domain (often recent)
-            r'-\d+$',  # Ends with dash and numbers
-            r'\d{2,}',  # Multiple consecutive digits
-        ]
-        
         # Check for suspicious patterns
-        for pattern in suspicious_patterns:
-            if re.search(pattern, domain):
-                return 30  # Assume relatively new
+        if has_suspicious_pattern(domain):
+            return 30  # Assume relatively new
         
         # Well-known old domains
-        old_domains = [
-            'google', 'yahoo', 'microsoft', 'apple', 'amazon',
-            'facebook', 'twitter', 'wikipedia', 'github', 'stackoverflow'
-        ]
-        
-        if any(old_domain in domain.lower() for old_domain in old_domains):
+        domain = domain.lower()
+        if any(old_domain in domain for old_domain in OLD_DOMAINS):
             return 5000  # Very old
         
         # Default: assume moderately aged
         return 365
         
-    except:
+    except (AttributeError, TypeError, UnicodeError):
         return -1
 
-def analyze_domain_structure(domain):
+def analyze_domain_structure(domain, parsed: ParsedUrl = None):
     """Analyze domain structure for suspicious patterns"""
     features = {}
     
     try:
-        # Extract domain parts
-        extracted = tldextract.extract(domain)
-        subdomain = extracted.subdomain
-        domain_name = extracted.domain
-        suffix = extracted.suffix
+        # Extract domain parts (already done if the caller passes a ParsedUrl)
+        if parsed is None:
+            extracted = extract(domain)
+            subdomain, domain_name, suffix = extracted.subdomain, extracted.domain, extracted.suffix
+        else:
+            subdomain, domain_name, suffix = parsed.subdomain, parsed.domain_name, parsed.suffix
         
         # Domain length analysis
         features['domain_length'] = len(domain)
         features['subdomain_count'] = len(subdomain.split('.')) if subdomain else 0
         
         # Suspicious patterns
-        features['has_numbers'] = bool(re.search(r'\d', domain_name))
+        features['has_numbers'] = bool(_DIGIT_RE.search(domain_name))
         features['has_hyphens'] = '-' in domain_name
         features['hyphen_count'] = domain_name.count('-')
         
         # Suspicious TLD
-        suspicious_tlds = ['tk', 'ml', 'ga', 'cf', 'pw', 'top', 'click', 'download', 'space']
-        features['suspicious_tld'] = suffix.lower() in suspicious_tlds
+        features['suspicious_tld'] = suffix.lower() in SUSPICIOUS_TLDS
         
         # Brand impersonation check
-        brand_keywords = [
-            'paypal', 'amazon', 'microsoft', 'google', 'apple', 'facebook',
-            'netflix', 'spotify', 'instagram', 'twitter', 'linkedin'
-        ]
-        features['brand_impersonation'] = any(brand in domain_name.lower() for brand in brand_keywords)
+        features['brand_impersonation'] = bool(find_brands(domain_name.lower()))
         
         # URL shortener check
-        shorteners = ['bit.ly', 'tinyurl', 't.co', 'goo.gl', 'ow.ly', 'short.link']
-        features['is_shortener'] = domain.lower() in shorteners
+        features['is_shortener'] = domain.lower() in SHORTENERS
         
         # Entropy calculation (randomness indicator)
-        import math
-        if domain_name:
-            entropy = -sum(p * math.log2(p) for p in 
-                          [domain_name.count(c)/len(domain_name) for c in set(domain_name)] if p > 0)
-            features['domain_entropy'] = entropy
+        if domain_name and njit is not None and domain_name.isascii():
+            features['domain_entropy'] = _entropy_u8(np.frombuffer(domain_name.encode('ascii'), dtype=np.uint8))
+        elif domain_name:
+            counts = np.fromiter(Counter(domain_name).values(), dtype=np.float64)
+            p = counts / counts.sum()
+            features['domain_entropy'] = float(-(p * np.log2(p)).sum())
         else:
             features['domain_entropy'] = 0
         
@@ -128,126 +318,176 @@ def analyze_domain_structure(domain):
             'analysis_error': str(e)
         }
 
+def _column(df, name, default, dtype):
+    """Returns a feature column as a NumPy array, filling gaps with the scalar default"""
+    if name not in df:
+        return np.full(len(df), default, dtype=dtype)
+    return df[name].fillna(default).to_numpy(dtype=dtype)
+
+def calculate_domain_risk_score_batch(df: pd.DataFrame) -> np.ndarray:
+    """Calculate risk scores for a frame of domain features (one row per URL)"""
+    m = np.column_stack([_column(df, name, default, np.float64) for name, default in RISK_FEATURES])
+    return _risk_from_matrix(m)
+
 def calculate_domain_risk_score(features):
     """Calculate risk score based on domain features"""
-    risk_score = 0.0
-    
-    # Age-based risk
-    domain_age = features.get('domain_age', -1)
-    if domain_age == -1:
-        risk_score += 0.1  # Unknown age penalty
-    elif domain_age < 30:
-        risk_score += 0.4  # Very new domain
-    elif domain_age < 90:
-        risk_score += 0.2  # New domain
-    elif domain_age > 365 * 2:
-        risk_score -= 0.1  # Old domain bonus
-    
-    # SSL check
-    if not features.get('has_ssl', True):
-        risk_score += 0.3
-    
-    # Domain structure risks
-    if features.get('suspicious_tld', False):
-        risk_score += 0.3
-    
-    if features.get('brand_impersonation', False):
-        risk_score += 0.4
-    
-    if features.get('is_shortener', False):
-        risk_score += 0.2
-    
-    # Length and complexity
-    domain_length = features.get('domain_length', 0)
-    if domain_length > 50:
-        risk_score += 0.2
-    elif domain_length < 5:
-        risk_score += 0.1
-    
-    # Hyphen abuse
-    hyphen_count = features.get('hyphen_count', 0)
-    if hyphen_count > 2:
-        risk_score += 0.2
-    elif hyphen_count > 0:
-        risk_score += 0.1
+    m = np.array([[
+        default if features.get(name) is None else features[name]
+        for name, default in RISK_FEATURES
+    ]], dtype=np.float64)
+    return float(_risk_from_matrix(m)[0])
+
+def _model_matrix(feature_dicts) -> np.ndarray:
+    """Packs feature dicts into the (N, 3) float32 array the domain model expects"""
+    x = np.empty((len(feature_dicts), len(MODEL_FEATURES)), dtype=np.float32)
+    for i, features in enumerate(feature_dicts):
+        x[i, 0] = features.get('domain_age', -1)
+        x[i, 1] = int(features.get('has_ssl', False))
+        x[i, 2] = features.get('domain_length', 0)
+    return x
+
+def _predict(model, x):
+    """
+    model.predict on the plain array. _get_model has already matched the
+    trained column names against MODEL_FEATURES, so sklearn's warning about
+    the array having no feature names is silenced.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+        return model.predict(x)
+
+def _collect_features(parsed: ParsedUrl) -> dict:
+    """Basic + structural features for one domain (no scoring)"""
+    basic_features = {
+        'has_ssl': parsed.url.startswith('https://'),
+        'domain_length': len(parsed.netloc),
+    }
     
-    # High entropy (random strings)
-    entropy = features.get('domain_entropy', 0)
-    if entropy > 3.5:
-        risk_score += 0.15
+    # Get domain age
+    basic_features['domain_age'] = get_domain_age(parsed.netloc)
     
-    # Subdomain abuse
-    subdomain_count = features.get('subdomain_count', 0)
-    if subdomain_count > 2:
-        risk_score += 0.1
+    # Analyze domain structure
+    structure_features = analyze_domain_structure(parsed.netloc, parsed)
     
-    return min(max(risk_score, 0.0), 1.0)
+    # Combine all features
+    return {**basic_features, **structure_features}
+
+def _apply_rule_based_score(all_features: dict, risk_score: float) -> None:
+    all_features['domain_risk_score'] = risk_score
+    all_features['domain_risk'] = 1 if risk_score > 0.5 else 0
 
-def get_features(url: str) -> dict:
-    """Main function to analyze domain and return features"""
+def _no_domain_features() -> dict:
+    return {
+        "error": "Invalid URL - no domain found",
+        "domain_risk": 0.5,
+        "domain_age": -1,
+        "has_ssl": False,
+        "domain_length": 0
+    }
+
+def _whitelisted_features(url: str, domain: str) -> dict:
+    # Known-safe registrable domain: skip WHOIS, regex and entropy work entirely
+    return {
+        'has_ssl': url.startswith('https://'),
+        'domain_length': len(domain),
+        'domain_age': 5000,
+        'domain_risk': 0,
+        'domain_risk_score': 0.0,
+        'whitelisted': True
+    }
+
+def _error_features(url: str, e: Exception) -> dict:
+    # Return safe fallback
+    return {
+        "error": f"Domain analysis failed: {str(e)}",
+        "domain_risk": 0.5,
+        "domain_age": -1,
+        "has_ssl": url.startswith('https://') if url else False,
+        "domain_length": len(urlparse(url).netloc) if url else 0,
+        "analysis_method": "error_fallback"
+    }
+
+def get_features(url) -> dict:
+    """Main function to analyze domain and return features (url may be a str or ParsedUrl)"""
     try:
         # Parse URL
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
+        parsed = parse_url(url)
+        url = parsed.url
+        domain = parsed.netloc
         
         if not domain:
-            return {
-                "error": "Invalid URL - no domain found",
-                "domain_risk": 0.5,
-                "domain_age": -1,
-                "has_ssl": False,
-                "domain_length": 0
-            }
-        
-        # Basic features
-        basic_features = {
-            'has_ssl': url.startswith('https://'),
-            'domain_length': len(domain),
-        }
+            return _no_domain_features()
         
-        # Get domain age
-        basic_features['domain_age'] = get_domain_age(domain)
+        if is_whitelisted(domain):
+            return _whitelisted_features(url, domain)
         
-        # Analyze domain structure
-        structure_features = analyze_domain_structure(domain)
-        
-        # Combine all features
-        all_features = {**basic_features, **structure_features}
+        all_features = _collect_features(parsed)
         
         # Calculate risk score
+        model = _get_model()
         if model is not None:
             try:
-                # Prepare features for ML model
-                feature_df = pd.DataFrame([{
-                    'domain_age': all_features.get('domain_age', -1),
-                    'has_ssl': int(all_features.get('has_ssl', False)),
-                    'domain_length': all_features.get('domain_length', 0)
-                }])
-                
                 # Get model prediction
-                prediction = model.predict(feature_df)[0]
+                prediction = _predict(model, _model_matrix([all_features]))[0]
                 all_features['domain_risk'] = int(prediction)
                 
             except Exception as e:
                 # Fallback to rule-based scoring
-                all_features['domain_risk_score'] = calculate_domain_risk_score(all_features)
-                all_features['domain_risk'] = 1 if all_features['domain_risk_score'] > 0.5 else 0
+                _apply_rule_based_score(all_features, calculate_domain_risk_score(all_features))
                 all_features['model_error'] = str(e)
         else:
             # No model available - use rule-based scoring
-            all_features['domain_risk_score'] = calculate_domain_risk_score(all_features)
-            all_features['domain_risk'] = 1 if all_features['domain_risk_score'] > 0.5 else 0
+            _apply_rule_based_score(all_features, calculate_domain_risk_score(all_features))
             all_features['model_status'] = 'not_available'
         
         return all_features
         
     except Exception as e:
-        # Return safe fallback
-        return {
-            "error": f"Domain analysis failed: {str(e)}",
-            "domain_risk": 0.5,
-            "domain_age": -1,
-            "has_ssl": url.startswith('https://') if url else False,
-            "domain_length": len(urlparse(url).netloc) if url else 0,
-            "analysis_method": "error_fallback"
-        }
\ No newline at end of file
+        return _error_features(url, e)
+
+def get_features_batch(urls: list) -> list:
+    """
+    Same as get_features for many URLs, but scores them with a single
+    model.predict call (or one vectorised rule-based pass).
+    """
+    results = [None] * len(urls)
+    scored = []  # feature dicts (shared with results) still waiting for a risk score
+    
+    for i, url in enumerate(urls):
+        try:
+            parsed = parse_url(url)
+            url = parsed.url
+            if not parsed.netloc:
+                results[i] = _no_domain_features()
+                continue
+            if is_whitelisted(parsed.netloc):
+                results[i] = _whitelisted_features(url, parsed.netloc)
+                continue
+            features = _collect_features(parsed)
+            results[i] = features
+            scored.append(features)
+        except Exception as e:
+            results[i] = _error_features(url, e)
+    
+    if not scored:
+        return results
+    
+    model = _get_model()
+    if model is not None:
+        try:
+            predictions = _predict(model, _model_matrix(scored))
+            for features, prediction in zip(scored, predictions):
+                features['domain_risk'] = int(prediction)
+            return results
+        except Exception as e:
+            for features in scored:
+                features['model_error'] = str(e)
+    else:
+        for features in scored:
+            features['model_status'] = 'not_available'
+    
+    risk_scores = calculate_domain_risk_score_batch(pd.DataFrame(scored))
+    for features, risk_score in zip(scored, risk_scores):
+        _apply_rule_based_score(features, float(risk_score))
+    
+    return results
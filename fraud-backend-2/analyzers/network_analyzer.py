@@ -1,15 +1,89 @@
 # analyzers/network_analyzer.py
 
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import requests
 import dns.resolver
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
+from cachetools import TTLCache
 
-def get_network_features(url: str) -> dict:
+from .common import ParsedUrl, build_http_session
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import aiohttp
+    import aiodns
+    import pycares
+except ImportError:
+    aiohttp = None
+    aiodns = None
+    pycares = None
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+REQUEST_TIMEOUT = 10
+
+# Upper bounds on how much of a page is read and how many links are counted -
+# the link ratio settles long before either is reached on real pages
+MAX_BODY_BYTES = 2_000_000
+MAX_LINKS = 500
+READ_CHUNK_SIZE = 64 * 1024
+
+# Batch mode: how many URLs are in flight at once, and per-host politeness
+BATCH_CONCURRENCY = 64
+LIMIT_PER_HOST = 4
+
+# Default session (keep-alive, pooled) when the caller doesn't inject one
+_SESSION = build_http_session()
+_PAGE_HEADERS = {'User-Agent': USER_AGENT}
+
+# MX/TXT records rarely change, so reuse answers for a day. Only real answers
+# (records, NXDOMAIN, no data) are stored - timeouts and SERVFAILs are retried
+DNS_CACHE = TTLCache(maxsize=10_000, ttl=86400)
+_dns_cache_lock = threading.Lock()
+
+# Shared resolver: dnspython's own LRU cache honours record TTLs for any
+# lookup that misses DNS_CACHE, and lifetime bounds a slow lookup
+_RESOLVER = dns.resolver.Resolver()
+_RESOLVER.cache = dns.resolver.LRUCache(10_000)
+_RESOLVER.lifetime = 3.0
+
+def _resolve_or_empty(domain: str, rdtype: str):
+    """Resolves a record type; a definitive 'no such records' answer is (). Transient errors raise"""
+    try:
+        return _RESOLVER.resolve(domain, rdtype)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return ()
+
+def lookup_dns_records(domain: str) -> tuple:
     """
-    Fetches the webpage and analyzes its content, links, headers, and DNS records.
+    Returns (has_mx_record, has_spf_record) for a domain.
     """
-    features = {
+    with _dns_cache_lock:
+        result = DNS_CACHE.get(domain)
+    if result is not None:
+        return result
+    
+    try:
+        mx_records = _resolve_or_empty(domain, 'MX')
+        txt_records = _resolve_or_empty(domain, 'TXT')
+    except Exception:
+        # Lookup failed (timeout, SERVFAIL) - report no records, but don't cache it
+        return False, False
+    
+    result = (len(mx_records) > 0, any("v=spf1" in str(r) for r in txt_records))
+    with _dns_cache_lock:
+        DNS_CACHE[domain] = result
+    return result
+
+def _empty_features(url: str) -> dict:
+    return {
         "is_reachable": False,
         "final_url": url,
         "has_csp_header": False,
@@ -21,50 +95,176 @@ def get_network_features(url: str) -> dict:
         "network_error": None
     }
 
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-        response.raise_for_status()
-
-        features["is_reachable"] = True
-        features["final_url"] = response.url
-
-        # 1. HTTP Header Analysis
-        features["has_csp_header"] = "content-security-policy" in response.headers
-        features["has_hsts_header"] = "strict-transport-security" in response.headers
-        features["has_xfo_header"] = "x-frame-options" in response.headers
-
-        # 2. Outgoing Link Analysis
-        soup = BeautifulSoup(response.content, 'html.parser')
-        domain = urlparse(features["final_url"]).netloc
-        
-        internal_links = 0
-        external_links = 0
+def _iter_hrefs(content: bytes):
+    """Yields the href of every <a href> on the page (lexbor C parser when available)"""
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(content)
+        for a_tag in tree.css('a[href]'):
+            yield a_tag.attributes.get('href') or ''
+    else:
+        soup = BeautifulSoup(content, 'html.parser')
         for a_tag in soup.find_all('a', href=True):
-            href = a_tag.get('href', '')
-            if href.startswith(('http', '//')):
-                link_domain = urlparse(href).netloc
-                if domain in link_domain:
-                    internal_links += 1
-                else:
-                    external_links += 1
-        
-        total_links = internal_links + external_links
-        if total_links > 0:
-            features["outgoing_link_ratio"] = external_links / total_links
+            yield a_tag.get('href', '')
+
+def _analyze_response(features: dict, final_url: str, headers, content: bytes) -> None:
+    """Fills in the header and outgoing-link features for a fetched page."""
+    features["is_reachable"] = True
+    features["final_url"] = final_url
+
+    # 1. HTTP Header Analysis
+    features["has_csp_header"] = "content-security-policy" in headers
+    features["has_hsts_header"] = "strict-transport-security" in headers
+    features["has_xfo_header"] = "x-frame-options" in headers
+
+    # 2. Outgoing Link Analysis
+    domain = urlparse(final_url).netloc
+    
+    internal_links = 0
+    external_links = 0
+    for href in islice(_iter_hrefs(content), MAX_LINKS):
+        if href.startswith(('http', '//')):
+            link_domain = urlparse(href).netloc
+            if domain in link_domain:
+                internal_links += 1
+            else:
+                external_links += 1
+    
+    total_links = internal_links + external_links
+    if total_links > 0:
+        features["outgoing_link_ratio"] = external_links / total_links
+
+def _read_capped(response) -> bytes:
+    """Reads at most MAX_BODY_BYTES of a streamed requests response body"""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+        body += chunk
+        if len(body) >= MAX_BODY_BYTES:
+            break
+    return bytes(body[:MAX_BODY_BYTES])
+
+async def _read_capped_async(response) -> bytes:
+    """Reads at most MAX_BODY_BYTES of an aiohttp response body"""
+    body = bytearray()
+    while len(body) < MAX_BODY_BYTES:
+        chunk = await response.content.read(MAX_BODY_BYTES - len(body))
+        if not chunk:
+            break
+        body += chunk
+    return bytes(body)
+
+def get_network_features(url, session=None) -> dict:
+    """
+    Fetches the webpage and analyzes its content, links, headers, and DNS records.
+    url may be a str or a ParsedUrl; session is an optional requests.Session.
+    """
+    if isinstance(url, ParsedUrl):
+        url = url.url
+    features = _empty_features(url)
+
+    try:
+        with (session or _SESSION).get(url, headers=_PAGE_HEADERS, timeout=REQUEST_TIMEOUT,
+                                        allow_redirects=True, stream=True) as response:
+            response.raise_for_status()
+            body = _read_capped(response)
+
+        _analyze_response(features, response.url, response.headers, body)
 
         # 3. DNS Record Analysis
-        try:
-            domain_to_check = urlparse(features["final_url"]).netloc
-            mx_records = dns.resolver.resolve(domain_to_check, 'MX')
-            features["dns_has_mx_record"] = len(mx_records) > 0
-            txt_records = dns.resolver.resolve(domain_to_check, 'TXT')
-            features["dns_has_spf_record"] = any("v=spf1" in str(r) for r in txt_records)
-        except Exception:
-            # If DNS lookup fails, features remain False, which is fine
-            pass
+        domain_to_check = urlparse(features["final_url"]).netloc
+        features["dns_has_mx_record"], features["dns_has_spf_record"] = lookup_dns_records(domain_to_check)
 
     except requests.RequestException as e:
         features["network_error"] = f"Request failed: {str(e)}"
     
-    return features
\ No newline at end of file
+    return features
+
+def _is_transient_dns_error(answer) -> bool:
+    """True for an aiodns failure other than NXDOMAIN / no data (those are real answers)"""
+    if not isinstance(answer, Exception):
+        return False
+    code = answer.args[0] if isinstance(answer, aiodns.error.DNSError) and answer.args else None
+    return code not in (pycares.errno.ARES_ENOTFOUND, pycares.errno.ARES_ENODATA)
+
+async def lookup_dns_records_async(domain: str, resolver) -> tuple:
+    """
+    Async version of lookup_dns_records - MX and TXT are queried concurrently.
+    Shares DNS_CACHE with the synchronous path.
+    """
+    with _dns_cache_lock:
+        result = DNS_CACHE.get(domain)
+    if result is not None:
+        return result
+
+    mx_records, txt_records = await asyncio.gather(
+        resolver.query(domain, 'MX'),
+        resolver.query(domain, 'TXT'),
+        return_exceptions=True
+    )
+    has_mx = not isinstance(mx_records, Exception) and len(mx_records) > 0
+    has_spf = False
+    if not isinstance(txt_records, Exception):
+        for record in txt_records:
+            text = record.text.decode(errors='ignore') if isinstance(record.text, bytes) else record.text
+            if "v=spf1" in text:
+                has_spf = True
+                break
+
+    result = (has_mx, has_spf)
+    if not (_is_transient_dns_error(mx_records) or _is_transient_dns_error(txt_records)):
+        with _dns_cache_lock:
+            DNS_CACHE[domain] = result
+    return result
+
+async def get_network_features_async(url: str, session, resolver) -> dict:
+    """
+    Async version of get_network_features using a shared aiohttp session
+    and aiodns resolver, so many URLs can be analyzed concurrently.
+    """
+    features = _empty_features(url)
+
+    try:
+        async with session.get(url, allow_redirects=True, raise_for_status=True) as response:
+            body = await _read_capped_async(response)
+            _analyze_response(features, str(response.url), response.headers, body)
+
+        # 3. DNS Record Analysis
+        domain_to_check = urlparse(features["final_url"]).netloc
+        features["dns_has_mx_record"], features["dns_has_spf_record"] = await lookup_dns_records_async(domain_to_check, resolver)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        features["network_error"] = f"Request failed: {str(e)}"
+    
+    return features
+
+async def get_network_features_batch_async(urls: list, concurrency: int = BATCH_CONCURRENCY) -> list:
+    """
+    Analyzes many URLs concurrently over one shared connection pool.
+    Results are returned in the same order as the input URLs.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    resolver = aiodns.DNSResolver()
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=LIMIT_PER_HOST)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     headers={'User-Agent': USER_AGENT}) as session:
+        async def bounded(url):
+            async with semaphore:
+                return await get_network_features_async(url, session, resolver)
+
+        return await asyncio.gather(*(bounded(url) for url in urls))
+
+def get_network_features_batch(urls: list, concurrency: int = BATCH_CONCURRENCY) -> list:
+    """
+    Synchronous entry point for batch network analysis. Uses aiohttp/aiodns
+    when installed, otherwise falls back to a thread pool over
+    get_network_features.
+    """
+    if not urls:
+        return []
+
+    if aiohttp is None or aiodns is None:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(urls))) as executor:
+            return list(executor.map(get_network_features, urls))
+
+    return asyncio.run(get_network_features_batch_async(urls, concurrency))
@@ -1,19 +1,46 @@
 # analyzers/reputation_analyzer.py - FIXED VERSION WITH BETTER DEBUGGING
 
 import os
+import asyncio
 import base64
 import requests
 from urllib.parse import urlparse
 import time
 import logging
+import threading
+from cachetools import TTLCache, cached
 from pysafebrowsing import SafeBrowsing
 
+from .common import ParsedUrl, build_http_session, parse_url
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 # Setup logging for debugging
 logger = logging.getLogger(__name__)
 
 # Load API key from environment variables with fallback
 API_KEY = os.getenv('VIRUSTOTAL_API_KEY')
 VT_API_URL = "https://www.virustotal.com/api/v3/urls"
+_VT_URL_PREFIX = VT_API_URL + "/"
+
+# Batch limits: GSB threatMatches:find takes at most 500 URLs per request.
+# VT_CONCURRENCY only caps how many VirusTotal requests are in flight at once;
+# it does not enforce the free tier's 4 requests/minute quota - lookups over
+# the quota come back as rate_limited (uncached) and are retried next time
+GSB_BATCH_SIZE = 500
+VT_CONCURRENCY = 4
+
+# VirusTotal request headers - sent per request, so the API key stays off
+# shared sessions
+_VT_HEADERS = {"User-Agent": "FraudDetectionSystem/1.0"}
+if API_KEY:
+    _VT_HEADERS["x-apikey"] = API_KEY
+
+# Default session when the caller doesn't inject one (e.g. the app's shared session)
+_SESSION = build_http_session()
 
 # Simple blacklist for common malicious domains (fallback)
 KNOWN_MALICIOUS_DOMAINS = {
@@ -38,192 +65,278 @@ KNOWN_SAFE_DOMAINS = {
     'starbucks.com', 'mcdonalds.com', 'coca-cola.com', 'nike.com', 'adidas.com'
 }
 
+# Lookup caches - only successful API answers are stored so transient
+# failures (timeouts, rate limits) are retried on the next request
+CACHE_TTL = 86400
+WHITELIST_CACHE = TTLCache(maxsize=10_000, ttl=CACHE_TTL)
+GSB_CACHE = TTLCache(maxsize=10_000, ttl=CACHE_TTL)
+VT_CACHE = TTLCache(maxsize=10_000, ttl=CACHE_TTL)
+# cachetools caches aren't thread-safe; request threads and batch pools share these
+_CACHE_LOCK = threading.Lock()
+
+def _in_domain_list(domain, domains) -> bool:
+    """
+    True when the host (without www.) or one of its parent domains is listed -
+    one set lookup per label, so entries below the apex (sites.google.com)
+    still cover their subdomains.
+    """
+    labels = domain.lower().replace('www.', '').split('.')
+    return any('.'.join(labels[i:]) in domains for i in range(len(labels)))
+
+@cached(WHITELIST_CACHE, lock=_CACHE_LOCK)
 def check_domain_whitelist(domain):
-    """Check if domain is in our safe list"""
+    """Check if domain (or a parent domain of it) is in our safe list"""
     try:
-        # Remove www. prefix for checking
-        clean_domain = domain.lower().replace('www.', '')
-        
-        # Check exact matches
-        if clean_domain in KNOWN_SAFE_DOMAINS:
-            return True
-        
-        # Check if it's a subdomain of a known safe domain
-        for safe_domain in KNOWN_SAFE_DOMAINS:
-            if clean_domain.endswith('.' + safe_domain):
-                return True
-        
-        return False
-    except:
+        return _in_domain_list(domain, KNOWN_SAFE_DOMAINS)
+    except (AttributeError, TypeError):
         return False
 
+def is_whitelisted(domain) -> bool:
+    """Cached whitelist check other analyzers use to skip work on known-safe domains"""
+    return check_domain_whitelist(domain)
+
 # ... (keep other imports and code) ...
 
 def query_google_safe_browsing(url: str) -> dict:
     """Queries the Google Safe Browsing API using the pysafebrowsing library."""
+    return query_google_safe_browsing_batch([url])[url]
+
+def query_google_safe_browsing_batch(urls: list) -> dict:
+    """
+    Queries Google Safe Browsing for many URLs at once - threatMatches:find
+    accepts up to GSB_BATCH_SIZE URLs per request. Returns {url: result}.
+    """
     api_key = os.getenv('GOOGLE_SAFE_BROWSING_API_KEY')
     if not api_key:
-        return {"is_known_threat": False, "threat_type": "api_key_missing", "error": None}
+        return {url: {"is_known_threat": False, "threat_type": "api_key_missing", "error": None} for url in urls}
     
-    try:
-        sb = SafeBrowsing(api_key) # CORRECTED CLASS NAME
-        response = sb.lookup_urls([url])
+    with _CACHE_LOCK:
+        results = {url: GSB_CACHE[url] for url in urls if url in GSB_CACHE}
+    pending = list(dict.fromkeys(url for url in urls if url not in results))
+    if not pending:
+        return results
+    
+    sb = SafeBrowsing(api_key) # CORRECTED CLASS NAME
+    for start in range(0, len(pending), GSB_BATCH_SIZE):
+        chunk = pending[start:start + GSB_BATCH_SIZE]
+        try:
+            response = sb.lookup_urls(chunk)
+        except Exception as e:
+            for url in chunk:
+                results[url] = {"is_known_threat": False, "threat_type": None, "error": str(e)}
+            continue
         
-        # Check if the URL is in the response dictionary, meaning it's a threat
-        if url in response and response[url].get('malicious'):
-            threat_info = response[url]
-            return {
-                "is_known_threat": True,
-                "threat_type": threat_info.get("threat_type", "Unknown"),
-                "error": None
-            }
+        for url in chunk:
+            # Check if the URL is in the response dictionary, meaning it's a threat
+            if url in response and response[url].get('malicious'):
+                threat_info = response[url]
+                result = {
+                    "is_known_threat": True,
+                    "threat_type": threat_info.get("threat_type", "Unknown"),
+                    "error": None
+                }
+            else:
+                result = {"is_known_threat": False, "threat_type": None, "error": None}
             
-        return {"is_known_threat": False, "threat_type": None, "error": None}
-
-    except Exception as e:
-        return {"is_known_threat": False, "threat_type": None, "error": str(e)}
+            with _CACHE_LOCK:
+                GSB_CACHE[url] = result
+            results[url] = result
+    
+    return results
     
 
 def check_domain_blacklist(domain):
     """Check if domain is in our malicious list"""
     try:
-        clean_domain = domain.lower().replace('www.', '')
-        return clean_domain in KNOWN_MALICIOUS_DOMAINS
-    except:
+        return _in_domain_list(domain, KNOWN_MALICIOUS_DOMAINS)
+    except (AttributeError, TypeError):
         return False
 
-def query_virustotal(url):
-    """Query VirusTotal API with proper error handling and debugging"""
-    print(f"🔍 VirusTotal API Check: {API_KEY is not None}")
+def _vt_error(error_msg: str, scan_status: str, api_available: bool, **extra) -> dict:
+    return {
+        "error": error_msg,
+        "virustotal_positives": 0,
+        "api_available": api_available,
+        "scan_status": scan_status,
+        **extra
+    }
+
+def _vt_not_found() -> dict:
+    return {
+        "virustotal_positives": 0,
+        "virustotal_total": 0,
+        "api_available": True,
+        "scan_status": "not_found",
+        "message": "URL not found in VirusTotal database"
+    }
+
+def _vt_rate_limited() -> dict:
+    return _vt_error("VirusTotal API rate limit exceeded", "rate_limited", True, rate_limited=True)
+
+def _vt_parse_report(vt_result: dict) -> dict:
+    """Turns a VirusTotal URL report into our reputation fields."""
+    # Extract the analysis stats
+    data = vt_result.get("data", {})
+    attributes = data.get("attributes", {})
+    stats = attributes.get("last_analysis_stats", {})
+    
+    malicious = stats.get("malicious", 0)
+    suspicious = stats.get("suspicious", 0)
+    clean = stats.get("clean", 0)
+    undetected = stats.get("undetected", 0)
+    total_engines = malicious + suspicious + clean + undetected
+    
+    positives = malicious + suspicious
     
+    logger.debug("VirusTotal results: %d/%d engines flagged as malicious", positives, total_engines)
+    
+    return {
+        "virustotal_positives": positives,
+        "virustotal_total": total_engines,
+        "malicious": malicious,
+        "suspicious": suspicious,
+        "clean": clean,
+        "undetected": undetected,
+        "api_available": True,
+        "scan_status": "found",
+        "scan_date": attributes.get("last_analysis_date", ""),
+        "reputation_score": min(positives / max(total_engines, 1) * 2, 1.0) if total_engines > 0 else 0.0
+    }
+
+def _vt_report_url(url: str) -> str:
+    # VirusTotal API v3 requires the URL to be base64-encoded
+    url_id = base64.urlsafe_b64encode(url.encode()).rstrip(b"=").decode("ascii")
+    return _VT_URL_PREFIX + url_id
+
+def query_virustotal(url, session=None):
+    """Query VirusTotal API with proper error handling and debugging"""
     if not API_KEY:
-        print("⚠️  VirusTotal API key not configured")
-        return {
-            "error": "VirusTotal API key not configured",
-            "virustotal_positives": 0,
-            "api_available": False,
-            "scan_status": "api_key_missing"
-        }
+        logger.debug("VirusTotal API key not configured")
+        return _vt_error("VirusTotal API key not configured", "api_key_missing", False)
+    
+    with _CACHE_LOCK:
+        cached_result = VT_CACHE.get(url)
+    if cached_result is not None:
+        return cached_result
     
     try:
-        # VirusTotal API v3 requires the URL to be base64-encoded
-        url_id = base64.urlsafe_b64encode(url.encode()).decode().strip("=")
-        
-        headers = {
-            "x-apikey": API_KEY,
-            "User-Agent": "FraudDetectionSystem/1.0"
-        }
-        
-        full_url = f"{VT_API_URL}/{url_id}"
-        print(f"🌐 Querying VirusTotal: {full_url[:50]}...")
+        full_url = _vt_report_url(url)
+        logger.debug("Querying VirusTotal: %.50s...", full_url)
         
         # Make request with timeout
-        response = requests.get(full_url, headers=headers, timeout=15)
+        response = (session or _SESSION).get(full_url, headers=_VT_HEADERS, timeout=15)
         
-        print(f"📊 VirusTotal Response Status: {response.status_code}")
+        logger.debug("VirusTotal response status: %d", response.status_code)
         
         if response.status_code == 404:
             # URL not found in VirusTotal database
-            print("ℹ️  URL not found in VirusTotal database")
-            return {
-                "virustotal_positives": 0,
-                "virustotal_total": 0,
-                "api_available": True,
-                "scan_status": "not_found",
-                "message": "URL not found in VirusTotal database"
-            }
+            logger.debug("URL not found in VirusTotal database")
+            result = _vt_not_found()
+            with _CACHE_LOCK:
+                VT_CACHE[url] = result
+            return result
         
         if response.status_code == 429:
             # Rate limit hit
-            print("⚠️  VirusTotal API rate limit exceeded")
-            return {
-                "error": "VirusTotal API rate limit exceeded",
-                "virustotal_positives": 0,
-                "api_available": True,
-                "rate_limited": True,
-                "scan_status": "rate_limited"
-            }
+            logger.warning("VirusTotal API rate limit exceeded")
+            return _vt_rate_limited()
         
         response.raise_for_status()
         
         # Parse the JSON response
-        vt_result = response.json()
-        print(f"✅ VirusTotal data received")
-        
-        # Extract the analysis stats
-        data = vt_result.get("data", {})
-        attributes = data.get("attributes", {})
-        stats = attributes.get("last_analysis_stats", {})
-        
-        malicious = stats.get("malicious", 0)
-        suspicious = stats.get("suspicious", 0)
-        clean = stats.get("clean", 0)
-        undetected = stats.get("undetected", 0)
-        total_engines = malicious + suspicious + clean + undetected
-        
-        positives = malicious + suspicious
-        
-        print(f"🔍 VirusTotal Results: {positives}/{total_engines} engines flagged as malicious")
-        
-        return {
-            "virustotal_positives": positives,
-            "virustotal_total": total_engines,
-            "malicious": malicious,
-            "suspicious": suspicious,
-            "clean": clean,
-            "undetected": undetected,
-            "api_available": True,
-            "scan_status": "found",
-            "scan_date": attributes.get("last_analysis_date", ""),
-            "reputation_score": min(positives / max(total_engines, 1) * 2, 1.0) if total_engines > 0 else 0.0
-        }
+        result = _vt_parse_report(response.json())
+        with _CACHE_LOCK:
+            VT_CACHE[url] = result
+        return result
         
     except requests.exceptions.HTTPError as e:
         error_msg = f"VirusTotal API HTTP error: {e.response.status_code}"
-        print(f"❌ {error_msg}")
-        return {
-            "error": error_msg,
-            "virustotal_positives": 0,
-            "api_available": True,
-            "scan_status": "http_error"
-        }
+        logger.warning(error_msg)
+        return _vt_error(error_msg, "http_error", True)
     
     except requests.exceptions.Timeout:
         error_msg = "VirusTotal API timeout"
-        print(f"❌ {error_msg}")
-        return {
-            "error": error_msg,
-            "virustotal_positives": 0,
-            "api_available": True,
-            "timeout": True,
-            "scan_status": "timeout"
-        }
+        logger.warning(error_msg)
+        return _vt_error(error_msg, "timeout", True, timeout=True)
     
     except requests.exceptions.RequestException as e:
         error_msg = f"VirusTotal API request failed: {str(e)}"
-        print(f"❌ {error_msg}")
-        return {
-            "error": error_msg,
-            "virustotal_positives": 0,
-            "api_available": False,
-            "scan_status": "request_failed"
-        }
+        logger.warning(error_msg)
+        return _vt_error(error_msg, "request_failed", False)
     
     except Exception as e:
         error_msg = f"Unexpected error during VirusTotal check: {str(e)}"
-        print(f"❌ {error_msg}")
-        return {
-            "error": error_msg,
-            "virustotal_positives": 0,
-            "api_available": False,
-            "scan_status": "unexpected_error"
-        }
+        logger.warning(error_msg)
+        return _vt_error(error_msg, "unexpected_error", False)
 
-def get_features(url: str) -> dict:
+async def _query_virustotal_async(url, session, semaphore) -> dict:
+    with _CACHE_LOCK:
+        cached_result = VT_CACHE.get(url)
+    if cached_result is not None:
+        return cached_result
+    
+    async with semaphore:
+        try:
+            async with session.get(_vt_report_url(url)) as response:
+                if response.status == 404:
+                    result = _vt_not_found()
+                elif response.status == 429:
+                    return _vt_rate_limited()
+                else:
+                    response.raise_for_status()
+                    result = _vt_parse_report(await response.json())
+        
+        except aiohttp.ClientResponseError as e:
+            return _vt_error(f"VirusTotal API HTTP error: {e.status}", "http_error", True)
+        
+        except asyncio.TimeoutError:
+            return _vt_error("VirusTotal API timeout", "timeout", True, timeout=True)
+        
+        except aiohttp.ClientError as e:
+            return _vt_error(f"VirusTotal API request failed: {str(e)}", "request_failed", False)
+        
+        except Exception as e:
+            # e.g. a malformed report - fail this URL only, not the whole gather
+            return _vt_error(f"Unexpected error during VirusTotal check: {str(e)}", "unexpected_error", False)
+    
+    with _CACHE_LOCK:
+        VT_CACHE[url] = result
+    return result
+
+async def query_virustotal_batch_async(urls: list) -> dict:
+    """Queries VirusTotal for many URLs concurrently. Returns {url: result}."""
+    semaphore = asyncio.Semaphore(VT_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=15)
+    
+    async with aiohttp.ClientSession(headers=_VT_HEADERS, timeout=timeout) as session:
+        unique_urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(_query_virustotal_async(url, session, semaphore) for url in unique_urls))
+    
+    return dict(zip(unique_urls, results))
+
+def query_virustotal_batch(urls: list) -> dict:
+    """
+    Synchronous entry point for batched VirusTotal lookups. Requests run
+    concurrently (at most VT_CONCURRENCY in flight) when aiohttp is installed;
+    this is not a per-minute rate limit.
+    """
+    if not API_KEY or aiohttp is None:
+        return {url: query_virustotal(url) for url in urls}
+    
+    return asyncio.run(query_virustotal_batch_async(urls))
+
+def get_features(url, gsb_result: dict = None, vt_result: dict = None, session=None) -> dict:
     """
     Queries reputation sources (local lists, Google Safe Browsing, VirusTotal) 
     and returns reputation features with enhanced debugging.
+    url may be a str or an already parsed ParsedUrl.
+    gsb_result / vt_result may be supplied from a batch lookup to skip the API call.
+    session is an optional requests.Session for the VirusTotal call.
     """
+    parsed = url if isinstance(url, ParsedUrl) else None
+    if parsed is not None:
+        url = parsed.url
+    
     if not url or not isinstance(url, str):
         return {
             "error": "Invalid URL provided",
@@ -235,13 +348,14 @@ def get_features(url: str) -> dict:
         }
     
     try:
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
+        if parsed is None:
+            parsed = parse_url(url)
+        domain = parsed.netloc
         
         if not domain:
             return { "error": "Could not extract domain from URL", "scan_status": "no_domain" }
         
-        print(f"🔍 Reputation Analysis for: {domain}")
+        logger.debug("Reputation analysis for: %s", domain)
         
         result = {
             "domain": domain,
@@ -256,13 +370,13 @@ def get_features(url: str) -> dict:
         
         # 1. Quick whitelist check
         if check_domain_whitelist(domain):
-            print(f"✅ Domain {domain} is in trusted whitelist")
+            logger.debug("Domain %s is in trusted whitelist", domain)
             result.update({"is_on_whitelist": True, "scan_status": "whitelisted"})
             return result
         
         # 2. Quick local blacklist check
         if check_domain_blacklist(domain):
-            print(f"❌ Domain {domain} is in known malicious list")
+            logger.debug("Domain %s is in known malicious list", domain)
             result.update({
                 "is_on_blacklist": True,
                 "reputation_score": 1.0,
@@ -271,10 +385,11 @@ def get_features(url: str) -> dict:
             return result
 
         # 3. Query Google Safe Browsing API (High-priority check)
-        print(f"🔬 Querying Google Safe Browsing for {url}...")
-        gsb_result = query_google_safe_browsing(url)
+        logger.debug("Querying Google Safe Browsing for %s", url)
+        if gsb_result is None:
+            gsb_result = query_google_safe_browsing(url)
         if gsb_result.get("is_known_threat"):
-            print(f"❌ Google Safe Browsing Alert: {gsb_result.get('threat_type')}")
+            logger.info("Google Safe Browsing alert for %s: %s", url, gsb_result.get('threat_type'))
             result.update({
                 "is_on_blacklist": True,
                 "is_gsb_threat": True,
@@ -285,8 +400,9 @@ def get_features(url: str) -> dict:
             return result # Return immediately if GSB finds a threat
 
         # 4. Query VirusTotal if other checks are clean
-        print(f"🌐 Querying VirusTotal for {url}...")
-        vt_result = query_virustotal(url)
+        logger.debug("Querying VirusTotal for %s", url)
+        if vt_result is None:
+            vt_result = query_virustotal(url, session)
         result.update(vt_result)
         
         # Set blacklist status and score based on VirusTotal results
@@ -306,16 +422,14 @@ def get_features(url: str) -> dict:
 
         result["analysis_timestamp"] = time.time()
         
-        print("📊 Reputation Analysis Complete:")
-        print(f"   - Google Safe Browsing: {'Threat Found' if result['is_gsb_threat'] else 'Clean'}")
-        print(f"   - VirusTotal: {result.get('virustotal_positives', 0)} positives")
-        print(f"   - Final Reputation Score: {result['reputation_score']:.2f}")
+        logger.debug("Reputation analysis complete for %s: gsb_threat=%s, vt_positives=%s, score=%.2f",
+                     domain, result['is_gsb_threat'], result.get('virustotal_positives', 0), result['reputation_score'])
         
         return result
         
     except Exception as e:
         error_msg = f"Reputation analysis failed: {str(e)}"
-        print(f"❌ {error_msg}")
+        logger.warning(error_msg)
         return {
             "error": error_msg,
             "virustotal_positives": 0,
@@ -325,20 +439,43 @@ def get_features(url: str) -> dict:
             "scan_status": "analysis_failed"
         }
 
+def get_features_batch(urls: list) -> dict:
+    """
+    Reputation features for many URLs. Safe Browsing is queried in one
+    batched request and VirusTotal concurrently, only for URLs that the
+    local lists and Safe Browsing did not already decide. Returns {url: features}.
+    """
+    parsed_urls = {url: parse_url(url) for url in urls if url and isinstance(url, str)}
+    pending = [
+        url for url, parsed in parsed_urls.items()
+        if parsed.netloc and not check_domain_whitelist(parsed.netloc) and not check_domain_blacklist(parsed.netloc)
+    ]
+    
+    gsb_results = query_google_safe_browsing_batch(pending) if pending else {}
+    vt_pending = [url for url in pending if not gsb_results[url].get("is_known_threat")]
+    vt_results = query_virustotal_batch(vt_pending) if vt_pending else {}
+    
+    return {
+        url: get_features(parsed_urls.get(url, url), gsb_result=gsb_results.get(url), vt_result=vt_results.get(url))
+        for url in urls
+    }
+
 def add_to_blacklist(domain):
     """Add a domain to the local blacklist (for manual additions)"""
     try:
         KNOWN_MALICIOUS_DOMAINS.add(domain.lower().replace('www.', ''))
         return True
-    except:
+    except (AttributeError, TypeError):
         return False
 
 def add_to_whitelist(domain):
     """Add a domain to the local whitelist (for manual additions)"""
     try:
         KNOWN_SAFE_DOMAINS.add(domain.lower().replace('www.', ''))
+        with _CACHE_LOCK:
+            WHITELIST_CACHE.clear()
         return True
-    except:
+    except (AttributeError, TypeError):
         return False
 
 def get_reputation_stats():
@@ -1,25 +1,247 @@
 # setup_visual_analyzer.py
 
+import argparse
+import hashlib
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib import metadata, util
 from pathlib import Path
 
-def install_requirements():
+try:
+    from packaging.requirements import Requirement
+except ImportError:
+    Requirement = None
+
+# Marker touched after a successful ChromeDriver install; while it is younger
+# than CHROMEDRIVER_CHECK_TTL the remote version check is skipped
+CHROMEDRIVER_SENTINEL = Path('visual_data/cache/.chromedriver_ok')
+CHROMEDRIVER_CHECK_TTL = 86400
+
+REQUIRED_PACKAGES = [
+    'selenium>=4.0.0',
+    'Pillow>=8.0.0',
+    'ImageHash>=4.2.0',
+    'numpy>=1.20.0',
+    'chromedriver-autoinstaller>=0.6.0'
+]
+
+# Top-level module each required package provides
+REQUIRED_MODULES = ['selenium', 'PIL', 'imagehash', 'numpy', 'chromedriver_autoinstaller']
+
+# Fingerprint of the last completed setup; a matching run exits immediately
+SETUP_FINGERPRINT = Path('visual_data/cache/.setup_fingerprint')
+
+# Exact pins of the required packages and their dependencies, written after
+# the first successful install so later runs can skip pip's resolver
+REQUIREMENTS_LOCK = Path('visual_data/cache/requirements.lock')
+
+# Held by the server process that writes the visual cache - never pruned
+VISUAL_CACHE_WRITER_LOCK = Path('visual_data/cache/visual_cache.lock')
+
+# Size cap for the screenshot and cache directories; least recently used
+# files are deleted beyond it
+CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# Parallel pip downloads - kept small so package mirrors don't throttle us
+DOWNLOAD_WORKERS = 4
+
+# pip's HTTP/wheel cache lives next to the project's own cache so repeat
+# setup runs are served from disk
+PIP_CACHE_DIR = 'visual_data/cache/pip'
+
+# No prompts and no self-update check in pip runs
+PIP_FLAGS = ['--disable-pip-version-check', '--no-input', '--cache-dir', PIP_CACHE_DIR]
+
+# For install/download: no progress-bar repainting, and wheels over sdists.
+# numpy and Pillow ship wheels for every supported platform, so never fall
+# back to a minutes-long source build for them - fail with pip's error instead
+FETCH_FLAGS = ['--progress-bar', 'off', '--prefer-binary', '--only-binary=numpy,Pillow']
+
+def _pip_has_fast_deps():
+    """True if the installed pip still offers the experimental fast-deps feature"""
+    try:
+        from pip._internal.cli.cmdoptions import use_new_feature
+        return 'fast-deps' in use_new_feature().choices
+    except (ImportError, AttributeError, TypeError):
+        return False
+
+# fast-deps lets the resolver read a wheel's METADATA with HTTP range requests
+# instead of downloading the whole wheel. The feature set changes between pip
+# releases, so only pass it when this pip accepts it
+if _pip_has_fast_deps():
+    FETCH_FLAGS.append('--use-feature=fast-deps')
+
+PIP_ENV = {**os.environ, 'PIP_DISABLE_PIP_VERSION_CHECK': '1', 'PYTHONDONTWRITEBYTECODE': '1'}
+
+# uv resolves, downloads and unpacks wheels in parallel, so installs go
+# through it when it is on PATH. It only takes the flags uv understands, and
+# --python so it installs into this interpreter rather than the active venv
+UV_PATH = shutil.which('uv')
+UV_INSTALL_FLAGS = ['--python', sys.executable, '--only-binary', 'numpy', '--only-binary', 'Pillow']
+
+# argv prefixes built once - every flag above ends up in exactly one of these
+PIP_ARGV = [sys.executable, '-m', 'pip']
+PIP_COMMAND_ARGV = {
+    'install': ([UV_PATH, 'pip', 'install', *UV_INSTALL_FLAGS] if UV_PATH
+                else [*PIP_ARGV, 'install', *PIP_FLAGS, *FETCH_FLAGS]),
+    'download': [*PIP_ARGV, 'download', *PIP_FLAGS, *FETCH_FLAGS],
+}
+
+def _run_pip(command, *args, verbose=False):
+    """Runs `pip <command>`; pip's stdout is discarded unless verbose (errors still reach stderr)"""
+    prefix = PIP_COMMAND_ARGV.get(command) or [*PIP_ARGV, command, *PIP_FLAGS]
+    subprocess.run(
+        prefix + list(args),
+        stdout=None if verbose else subprocess.DEVNULL,
+        env=PIP_ENV,
+        check=True
+    )
+
+def _download_packages(packages, dest):
+    """
+    Downloads each package (with its dependencies) into dest, several at once.
+    Failed downloads are retried once; returns the packages that still failed.
+    """
+    def download(package):
+        _run_pip('download', '-d', dest, package)
+    
+    failed = []
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(packages))) as executor:
+        futures = {executor.submit(download, package): package for package in packages}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except subprocess.CalledProcessError:
+                failed.append(futures[future])
+    
+    still_failed = []
+    for package in failed:
+        try:
+            download(package)
+        except subprocess.CalledProcessError as e:
+            print(f"⚠️  Could not download {package}: {e}")
+            still_failed.append(package)
+    return still_failed
+
+def _missing_packages(packages):
+    """
+    Returns the requirement specs that are not already installed at a matching
+    version. Without the packaging library every spec is treated as missing.
+    """
+    if Requirement is None:
+        return list(packages)
+    
+    missing = []
+    for spec in packages:
+        requirement = Requirement(spec)
+        try:
+            installed_version = metadata.version(requirement.name)
+        except metadata.PackageNotFoundError:
+            missing.append(spec)
+            continue
+        if not requirement.specifier.contains(installed_version, prereleases=True):
+            missing.append(spec)
+    return missing
+
+def _pinned_requirements(packages):
+    """
+    Returns `name==version` pins for the installed packages and everything they
+    depend on, like a `pip freeze` limited to what these packages pull in.
+    """
+    pins = {}
+    pending = [Requirement(spec).name for spec in packages]
+    while pending:
+        name = pending.pop()
+        key = name.lower().replace('_', '-')
+        if key in pins:
+            continue
+        try:
+            dist = metadata.distribution(name)
+        except metadata.PackageNotFoundError:
+            continue
+        pins[key] = f"{dist.metadata['Name']}=={dist.version}"
+        for spec in dist.requires or []:
+            requirement = Requirement(spec)
+            if requirement.marker is None or requirement.marker.evaluate({'extra': ''}):
+                pending.append(requirement.name)
+    return sorted(pins.values())
+
+def _write_requirements_lock():
+    """Freezes the installed requirement set to REQUIREMENTS_LOCK"""
+    if Requirement is None:
+        return
+    REQUIREMENTS_LOCK.parent.mkdir(parents=True, exist_ok=True)
+    REQUIREMENTS_LOCK.write_text('\n'.join(_pinned_requirements(REQUIRED_PACKAGES)) + '\n')
+
+def _in_container():
+    """True inside a Docker image or a CI job, where packages are baked into the image"""
+    return os.path.exists('/.dockerenv') or bool(os.environ.get('CI') or os.environ.get('CONTAINER'))
+
+def install_requirements(verbose=False):
     """Install required packages"""
-    packages = [
-        'selenium>=4.0.0',
-        'Pillow>=8.0.0',
-        'ImageHash>=4.2.0',
-        'numpy>=1.20.0',
-        'chromedriver-autoinstaller>=0.6.0'
-    ]
+    # Trust the image's pinning: if every module is importable, don't even
+    # read package versions
+    if _in_container() and all(util.find_spec(module) for module in REQUIRED_MODULES):
+        print("✅ Required packages are provided by the container image")
+        return True
     
+    packages = _missing_packages(REQUIRED_PACKAGES)
+    if not packages:
+        print("✅ All required packages are already installed")
+        return True
+    
+    # Dependencies are already known from an earlier run: install the exact
+    # pins without resolving anything
+    if REQUIREMENTS_LOCK.exists():
+        print(f"Installing locked requirements from {REQUIREMENTS_LOCK}...")
+        try:
+            _run_pip('install', '--no-deps', '-r', str(REQUIREMENTS_LOCK), verbose=verbose)
+            if not _missing_packages(REQUIRED_PACKAGES):
+                print("✅ All packages installed successfully")
+                return True
+            print("⚠️  Lock file is out of date, resolving requirements again...")
+        except subprocess.CalledProcessError as e:
+            print(f"⚠️  Locked install failed ({e}), resolving requirements again...")
+    
+    if not _install_packages(packages, verbose):
+        return False
+    _write_requirements_lock()
+    return True
+
+def _install_packages(packages, verbose):
+    """Installs the given requirement specs, falling back through slower strategies"""
     print("Installing required packages...")
+    print(f"Installing {', '.join(packages)}...")
+    
+    # Download wheels concurrently, then install them all offline in one pip run.
+    # uv already downloads in parallel, so with uv go straight to the batch install
+    with tempfile.TemporaryDirectory() as download_dir:
+        if not UV_PATH and not _download_packages(packages, download_dir):
+            try:
+                _run_pip('install', '--no-index', '--find-links', download_dir, *packages, verbose=verbose)
+                print("✅ All packages installed successfully")
+                return True
+            except subprocess.CalledProcessError as e:
+                print(f"⚠️  Offline install failed ({e}), installing from the index...")
+    
+    try:
+        # One pip run: the resolver sees every package at once and reuses its connections
+        _run_pip('install', *packages, verbose=verbose)
+        print("✅ All packages installed successfully")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️  Batch install failed ({e}), retrying one package at a time...")
+    
+    # Fallback: install individually so we can report which package failed
     for package in packages:
         print(f"Installing {package}...")
         try:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', package])
+            _run_pip('install', package, verbose=verbose)
             print(f"✅ {package} installed successfully")
         except subprocess.CalledProcessError as e:
             print(f"❌ Error installing {package}: {e}")
@@ -29,10 +251,19 @@ def install_requirements():
 
 def setup_chromedriver():
     """Setup ChromeDriver automatically"""
+    try:
+        if CHROMEDRIVER_SENTINEL.stat().st_mtime > time.time() - CHROMEDRIVER_CHECK_TTL:
+            print("✅ ChromeDriver already set up (checked within the last 24h)")
+            return True
+    except FileNotFoundError:
+        pass
+    
     try:
         import chromedriver_autoinstaller
         print("Setting up ChromeDriver...")
         chromedriver_autoinstaller.install()
+        CHROMEDRIVER_SENTINEL.parent.mkdir(parents=True, exist_ok=True)
+        CHROMEDRIVER_SENTINEL.touch()
         print("✅ ChromeDriver setup completed")
         return True
     except Exception as e:
@@ -42,20 +273,59 @@ def setup_chromedriver():
         print("2. Add to your PATH")
         return False
 
+def _enforce_cache_limits(path, max_bytes=CACHE_MAX_BYTES):
+    """
+    Deletes the least recently accessed files directly under path until their
+    total size is at most max_bytes. Subdirectories (pip's cache) and this
+    script's own state files (and the cache writer lock) are left alone.
+    """
+    keep = {CHROMEDRIVER_SENTINEL, SETUP_FINGERPRINT, REQUIREMENTS_LOCK, VISUAL_CACHE_WRITER_LOCK}
+    entries = []
+    for entry in Path(path).iterdir():
+        if entry in keep:
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.is_file():
+            entries.append((stat.st_atime, stat.st_size, entry))
+    
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return
+    
+    entries.sort()
+    removed = 0
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        entry.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    print(f"🧹 Removed {removed} least recently used files from {path}")
+
 def create_directories():
     """Create necessary directories"""
+    # Leaves only - mkdir(parents=True) creates visual_data on the way
     directories = [
-        'visual_data',
         'visual_data/screenshots',
         'visual_data/phishing_templates',
-        'visual_data/cache'
+        'visual_data/cache',
+        PIP_CACHE_DIR
     ]
     
     print("Creating directories...")
     for directory in directories:
-        os.makedirs(directory, exist_ok=True)
+        Path(directory).mkdir(parents=True, exist_ok=True)
         print(f"✅ Created directory: {directory}")
 
+def enforce_cache_limits():
+    """Prune the screenshot and cache directories back under CACHE_MAX_BYTES"""
+    for directory in ('visual_data/screenshots', 'visual_data/cache'):
+        if os.path.isdir(directory):
+            _enforce_cache_limits(directory)
+
 def test_visual_analyzer():
     """Test the visual analyzer setup"""
     try:
@@ -87,11 +357,11 @@ def create_sample_integration():
     """Create a sample integration file"""
     integration_code = '''# sample_integration.py - Example of how to use the Visual Analyzer
 
-from analyzers.visual_analyzer import get_features, cleanup
-from enhanced_url_checker import EnhancedURLChecker
-
 def test_visual_integration():
     """Test visual analyzer with URL checker"""
+    # Imported here so importing this module doesn't load Selenium, numpy, etc.
+    from analyzers.visual_analyzer import get_features_batch, cleanup
+    from enhanced_url_checker import EnhancedURLChecker
     
     # Test URLs
     test_urls = [
@@ -103,11 +373,13 @@ def test_visual_integration():
     # Initialize URL checker
     checker = EnhancedURLChecker()
     
-    for url in test_urls:
+    # Get visual features for all URLs at once - get_features_batch loads the
+    # pages concurrently, each on its own WebDriver from the analyzer's pool
+    visual_results = get_features_batch(test_urls)
+    
+    for url, visual_result in zip(test_urls, visual_results):
         print(f"\\n--- Analyzing: {url} ---")
         
-        # Get visual features
-        visual_result = get_features(url)
         print(f"Visual Analysis Success: {visual_result.get('analysis_success', False)}")
         print(f"Visual Similarity Score: {visual_result.get('visual_similarity_score', 0):.3f}")
         print(f"Screenshot Path: {visual_result.get('screenshot_path', 'None')}")
@@ -128,13 +400,55 @@ if __name__ == "__main__":
     test_visual_integration()
 '''
     
-    with open('sample_integration.py', 'w') as f:
-        f.write(integration_code)
+    target = Path('sample_integration.py')
+    new_content = integration_code.encode()
+    if target.exists() and target.read_bytes() == new_content:
+        print("✅ sample_integration.py is up to date")
+        return
+    
+    # Write to a temp file and rename over the target so readers never see a partial file
+    tmp_path = target.with_name(target.name + '.tmp')
+    tmp_path.write_bytes(new_content)
+    os.replace(tmp_path, target)
     
     print("✅ Created sample_integration.py")
 
-def main():
+def setup_fingerprint():
+    """Hash of everything a completed setup depends on: packages, interpreter and this script"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(REQUIRED_PACKAGES).encode())
+    digest.update(sys.version.encode())
+    digest.update(sys.executable.encode())
+    digest.update(Path(__file__).read_bytes())
+    return digest.hexdigest()
+
+def parse_args(argv=None):
+    """Command line options for non-interactive (CI) runs"""
+    parser = argparse.ArgumentParser(description="Set up the Visual Analyzer")
+    parser.add_argument('--test', choices=['yes', 'no', 'auto'], default='auto',
+                        help="run the Visual Analyzer test after setup; 'auto' asks only on a terminal")
+    parser.add_argument('--force', action='store_true',
+                        help="run every setup step even if nothing changed since the last setup")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main setup function"""
+    args = parse_args(argv)
+    
+    # Caches grow between runs, so prune them even when setup itself is skipped
+    enforce_cache_limits()
+    
+    fingerprint = setup_fingerprint()
+    if not args.force:
+        try:
+            if SETUP_FINGERPRINT.read_text().strip() == fingerprint:
+                print("✅ Visual Analyzer already set up (use --force to run setup again)")
+                if args.test == 'yes':
+                    return test_visual_analyzer()
+                return True
+        except FileNotFoundError:
+            pass
+    
     print("=== Visual Analyzer Setup ===\\n")
     
     # Check if analyzers directory exists
@@ -148,24 +462,34 @@ def main():
             with open(init_file, 'w') as f:
                 f.write('# Analyzers package\\n')
     
-    # Step 1: Install requirements
-    if not install_requirements():
+    # Steps 1, 3 and 4 are independent: create directories and the sample
+    # integration on worker threads while pip runs on this one
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        local_steps = [executor.submit(create_directories), executor.submit(create_sample_integration)]
+        
+        # Step 1: Install requirements
+        requirements_ok = install_requirements()
+        
+        for step in local_steps:
+            step.result()
+    
+    if not requirements_ok:
         print("❌ Failed to install requirements. Please install manually.")
         return False
     
-    # Step 2: Setup ChromeDriver
-    if not setup_chromedriver():
+    # Step 2: Setup ChromeDriver (needs chromedriver-autoinstaller from step 1)
+    if setup_chromedriver():
+        SETUP_FINGERPRINT.write_text(fingerprint)
+    else:
         print("⚠️  ChromeDriver setup failed. You may need to install it manually.")
     
-    # Step 3: Create directories
-    create_directories()
-    
-    # Step 4: Create sample integration
-    create_sample_integration()
-    
     # Step 5: Test (optional)
-    test_choice = input("\\n🧪 Would you like to test the Visual Analyzer now? (y/n): ").lower().strip()
-    if test_choice == 'y':
+    if args.test == 'auto':
+        # Never block on a prompt when stdin is not a terminal (CI, piped runs)
+        run_test = sys.stdin.isatty() and input("\\n🧪 Would you like to test the Visual Analyzer now? (y/n): ").lower().strip() == 'y'
+    else:
+        run_test = args.test == 'yes'
+    if run_test:
         success = test_visual_analyzer()
         if not success:
             print("\\n⚠️  Testing failed, but setup is complete. Check your ChromeDriver installation.")
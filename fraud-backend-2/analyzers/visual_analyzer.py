@@ -9,7 +9,11 @@ Enhanced Visual Analyzer with Brand Impersonation Detection - FIXED
 """
 
 import os
+import atexit
+import functools
 import hashlib
+import queue
+import threading
 import time
 import cv2
 import numpy as np
@@ -21,13 +25,166 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from imagehash import ImageHash
 from urllib.parse import urlparse
 import json
-from datetime import datetime, timedelta
-from collections import Counter
+import re
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: single-process servers (waitress / dev server) only
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Dominant colors are counted on a downscaled copy of the screenshot, with
+# each channel quantized to 5 bits (32 levels, 32768 possible colors)
+COLOR_SAMPLE_SIZE = (128, 128)
+COLOR_QUANT_BITS = 5
+
+# 'histogram' (default) or 'kmeans' - OpenCV's C++ k-means over the same
+# downscaled pixels, for callers that want true cluster centers
+DOMINANT_COLOR_METHOD = 'histogram'
+
+def json_loads(data):
+    """Parse JSON (bytes or str) with orjson when installed"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def json_dumps(obj, indent=False) -> bytes:
+    """Serialize to UTF-8 JSON bytes with orjson when installed (NumPy values included)"""
+    if orjson:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
+# Phrases in the page source that suggest a phishing lure
+SUSPICIOUS_KEYWORDS = ('verify', 'account suspended', 'urgent', 'confirm', 'security alert', 'locked')
+
+# Collects the page's form/login signals inside the browser, so only this
+# small result crosses the WebDriver connection instead of the whole HTML
+PAGE_ELEMENTS_SCRIPT = """
+const html = document.documentElement.outerHTML.toLowerCase();
+return {
+    formCount: document.forms.length,
+    hasPassword: document.querySelector("input[type='password']") !== null,
+    hasLoginInput: document.querySelector("input[type='email'], input[name*='user'], input[name*='login']") !== null,
+    keywordHits: arguments[0].filter(keyword => html.includes(keyword))
+};
+"""
+
+# A 64-bit perceptual hash as 16 hex characters
+PHASH_HEX_RE = re.compile(r'[0-9a-fA-F]{16}')
+
+# Templates whose aHash is further than this (in bits) from a page's aHash
+# are not compared with it, and pages no template survives for are not
+# pHashed at all; pHash matches need ~9 bits or fewer
+AHASH_SCREEN_DISTANCE = 20
+
+def prepare_image(image):
+    """
+    The downsamples the analysis needs from a BGR screenshot, derived from one
+    pass over the full-size image:
+    - 'bgr_small': COLOR_SAMPLE_SIZE BGR, for the dominant-color histogram
+    - 'gray_8x8': 8x8 grayscale, the aHash input
+    The pHash is not taken from these: it is computed by imagehash from the
+    full-size image so it stays comparable with the stored template hashes.
+    """
+    bgr_small = cv2.resize(image, COLOR_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+    gray_8x8 = cv2.resize(cv2.cvtColor(bgr_small, cv2.COLOR_BGR2GRAY), (8, 8), interpolation=cv2.INTER_AREA)
+    return {'bgr_small': bgr_small, 'gray_8x8': gray_8x8}
+
+def average_hash(image):
+    """64-bit average hash as 16 hex chars: 8x8 grayscale thumbnail, bits above its mean"""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image.shape != (8, 8):
+        image = cv2.resize(image, (8, 8), interpolation=cv2.INTER_AREA)
+    bits = np.packbits(image > image.mean())
+    return bits.tobytes().hex()
+
+def popcount_u64(values):
+    """Per-element bit count of a uint64 array"""
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+# Chrome is kept running across URLs and restarted after this many page loads
+# to bound its memory growth
+DRIVER_MAX_REQUESTS = 50
+
+# Requests Chrome never makes: fonts, audio/video and analytics/ad beacons.
+# Images and CSS still load - the screenshot needs them for visual matching
+BLOCKED_URL_PATTERNS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.ogg', '*.m3u8',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*',
+]
+
+# Rendered screenshots whose hash + color results are remembered, keyed by
+# the PNG's content so identical pages share them whatever their URL
+CONTENT_CACHE_SIZE = 1000
+
+# URL result cache: at most this many entries in memory (least recently used
+# evicted). Each new result is appended to a log; the full JSON snapshot is
+# rewritten only every CACHE_SNAPSHOT_INTERVAL seconds and at exit
+CACHE_MAX_ENTRIES = 10000
+CACHE_SNAPSHOT_INTERVAL = 300
+
+# Headless Chrome instances shared by concurrent get_features calls
+DRIVER_POOL_SIZE = 3
+
+# Template libraries at least this large are scanned with the numba kernel;
+# below it thread start-up costs more than the scan
+NUMBA_MIN_TEMPLATES = 1024
+
+# SWAR popcount masks, typed uint64 so numba never promotes to float
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+_S1, _S2, _S4, _S56 = np.uint64(1), np.uint64(2), np.uint64(4), np.uint64(56)
+
+def _popcount_xor(hashes, query):
+    """Hamming distance from query to every uint64 hash (numba kernel source)"""
+    x = hashes ^ query
+    x = x - ((x >> _S1) & _M1)
+    x = (x & _M2) + ((x >> _S2) & _M2)
+    x = (x + (x >> _S4)) & _M4
+    return ((x * _H01) >> _S56).astype(np.uint8)
+
+@functools.cache
+def get_popcount_xor():
+    """
+    Compiles _popcount_xor on first use, so importing this module never pays
+    numba's import cost. With parallel=True numba fuses the array expressions
+    into one loop spread across all cores. None when numba is not installed.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(parallel=True, cache=True)(_popcount_xor)
+
+class DriverSlot:
+    """One WebDriver pool entry: a lazily started Chrome and the pages it has loaded"""
+    __slots__ = ('driver', 'requests')
+    
+    def __init__(self):
+        self.driver = None
+        self.requests = 0
+
 class EnhancedVisualAnalyzer:
     """Enhanced visual analyzer with brand impersonation detection"""
     
@@ -47,18 +204,39 @@ class EnhancedVisualAnalyzer:
         # Cache settings
         self.cache_duration_hours = 24
         self.cache_file = os.path.join(self.cache_dir, "visual_cache.json")
+        self.cache_log_file = os.path.join(self.cache_dir, "visual_cache.jsonl")
+        self._cache_lock = threading.Lock()
+        self._cache_dirty = False
+        # Server worker processes share visual_data/cache: only the one holding
+        # the writer lock appends to the log and snapshots, so no process
+        # truncates entries another one logged. The others keep theirs in memory
+        self._cache_writer = self._acquire_cache_writer()
         self.load_cache()
+        if self._cache_writer:
+            threading.Thread(target=self._snapshot_cache_periodically, daemon=True).start()
+            atexit.register(self.save_cache)
+        self._content_cache = OrderedDict()
+        self._content_cache_lock = threading.Lock()
         
         # Brand color signatures for detection
         self.brand_colors = self.load_brand_colors()
+        self.brand_color_arrays = self.build_brand_color_arrays(self.brand_colors)
+        self._brand_variants = self.build_brand_variants(self.brand_colors)
         
         # Known phishing template hashes - FIXED WITH VALID HASHES
         self.phishing_templates = self.load_phishing_templates()
+        self.index_templates()
         
-        # Selenium settings
-        self.driver = None
+        # Selenium settings - each concurrent get_features call checks out
+        # its own driver from the pool (Selenium drivers are not thread-safe)
+        self.pool_size = DRIVER_POOL_SIZE
+        self._driver_slots = [DriverSlot() for _ in range(self.pool_size)]
+        self.driver_pool = queue.Queue()
+        for slot in self._driver_slots:
+            self.driver_pool.put(slot)
         self.screenshot_timeout = 30
         self.page_load_timeout = 20
+        atexit.register(self.cleanup_driver)
         
         # Setup logging
         self.logger = logging.getLogger(__name__)
@@ -100,8 +278,8 @@ class EnhancedVisualAnalyzer:
         
         if os.path.exists(self.brand_colors_file):
             try:
-                with open(self.brand_colors_file, 'r') as f:
-                    loaded_colors = json.load(f)
+                with open(self.brand_colors_file, 'rb') as f:
+                    loaded_colors = json_loads(f.read())
                     # Merge defaults with loaded colors, loaded colors take precedence
                     for brand, data in loaded_colors.items():
                         default_brand_colors[brand] = data
@@ -110,37 +288,111 @@ class EnhancedVisualAnalyzer:
                 self.logger.warning(f"Could not load brand colors: {e}")
         
         try:
-            with open(self.brand_colors_file, 'w') as f:
-                json.dump(default_brand_colors, f, indent=2)
+            with open(self.brand_colors_file, 'wb') as f:
+                f.write(json_dumps(default_brand_colors, indent=True))
         except Exception as e:
             self.logger.warning(f"Could not save default brand colors: {e}")
         
         return default_brand_colors
     
+    def build_brand_color_arrays(self, brand_colors) -> dict:
+        """Convert brand color lists to contiguous arrays: brand -> ((M, 3) float32 colors, tolerance)"""
+        arrays = {}
+        for brand, brand_info in brand_colors.items():
+            all_brand_colors = brand_info.get('primary', []) + brand_info.get('secondary', [])
+            colors = np.ascontiguousarray(all_brand_colors, dtype=np.float32).reshape(-1, 3)
+            arrays[brand] = (colors, brand_info.get('tolerance', 25))
+        return arrays
+    
+    def build_brand_variants(self, brand_colors):
+        """
+        Maps each spelling a brand may appear as in a URL (name, o->0 swap, trailing 'l')
+        to its brand, compiled into an Aho-Corasick automaton when pyahocorasick is installed
+        """
+        variants = {}
+        for brand in brand_colors:
+            for variant in (brand, brand.replace('o', '0'), brand + 'l'):
+                variants.setdefault(variant, set()).add(brand)
+        
+        if ahocorasick is None:
+            return variants
+        automaton = ahocorasick.Automaton()
+        for variant, brands in variants.items():
+            automaton.add_word(variant, frozenset(brands))
+        automaton.make_automaton()
+        return automaton
+    
+    def find_brands_in_url(self, url_lower):
+        """Brands any of whose spellings appear in the (lowercase) URL, found in one pass"""
+        if ahocorasick is None:
+            return {brand for variant, brands in self._brand_variants.items() if variant in url_lower for brand in brands}
+        return {brand for _, brands in self._brand_variants.iter(url_lower) for brand in brands}
+    
     def load_cache(self):
-        """Load cached results"""
+        """Load cached results: the last snapshot plus the entries logged since"""
+        self.cache = OrderedDict()
         try:
             if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r') as f:
-                    self.cache = json.load(f)
-            else:
-                self.cache = {}
+                with open(self.cache_file, 'rb') as f:
+                    self.cache.update(json_loads(f.read()))
         except json.JSONDecodeError as e:
             self.logger.error(f"Error loading cache (corrupted file): {e}. Creating new cache.")
-            self.cache = {}
+            self.cache = OrderedDict()
         except Exception as e:
             self.logger.error(f"An unexpected error occurred while loading cache: {e}")
-            self.cache = {}
-            
-    def save_cache(self):
-        """Save cache to file"""
+            self.cache = OrderedDict()
+        
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=2)
-        except TypeError as e:
-            self.logger.error(f"Error saving cache (serialization failed): {e}")
+            if os.path.exists(self.cache_log_file):
+                with open(self.cache_log_file, 'rb') as f:
+                    for line in f:
+                        try:
+                            record = json_loads(line)
+                        except json.JSONDecodeError:
+                            continue  # partially written last line
+                        self.cache[record['url']] = record['entry']
+                        self.cache.move_to_end(record['url'])
+                self._cache_dirty = True
         except Exception as e:
-            self.logger.error(f"Unexpected error saving cache: {e}")
+            self.logger.error(f"Error replaying cache log: {e}")
+        
+        while len(self.cache) > CACHE_MAX_ENTRIES:
+            self.cache.popitem(last=False)
+            
+    def _acquire_cache_writer(self) -> bool:
+        """Try to become the one process that writes the cache files (held until exit)"""
+        if fcntl is None:
+            return True
+        try:
+            self._cache_writer_lock = open(os.path.join(self.cache_dir, "visual_cache.lock"), 'a')
+            fcntl.flock(self._cache_writer_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self.logger.info("Another process owns the visual cache files - caching in memory only")
+            return False
+    
+    def save_cache(self):
+        """Snapshot the whole cache to file and start a new, empty log"""
+        with self._cache_lock:
+            if not self._cache_writer or not self._cache_dirty:
+                return
+            try:
+                tmp_file = self.cache_file + '.tmp'
+                with open(tmp_file, 'wb') as f:
+                    f.write(json_dumps(self.cache))
+                os.replace(tmp_file, self.cache_file)
+                open(self.cache_log_file, 'w').close()
+                self._cache_dirty = False
+            except TypeError as e:
+                self.logger.error(f"Error saving cache (serialization failed): {e}")
+            except Exception as e:
+                self.logger.error(f"Unexpected error saving cache: {e}")
+    
+    def _snapshot_cache_periodically(self):
+        """Background thread: snapshot the cache every CACHE_SNAPSHOT_INTERVAL seconds"""
+        while True:
+            time.sleep(CACHE_SNAPSHOT_INTERVAL)
+            self.save_cache()
     
     def is_cached(self, url):
         """Check if URL analysis is cached and still valid"""
@@ -148,12 +400,12 @@ class EnhancedVisualAnalyzer:
             return False
         
         try:
-            cache_time = datetime.fromisoformat(self.cache[url]['timestamp'])
-            if datetime.now() - cache_time > timedelta(hours=self.cache_duration_hours):
+            # Timestamps are Unix epoch seconds, so expiry is one subtraction
+            if time.time() - self.cache[url]['timestamp'] > self.cache_duration_hours * 3600:
                 del self.cache[url]
                 return False
         except (KeyError, TypeError):
-             # Handle malformed cache entry for this URL
+             # Handle malformed cache entry for this URL (including pre-epoch ISO timestamps)
             del self.cache[url]
             return False
             
@@ -161,15 +413,30 @@ class EnhancedVisualAnalyzer:
     
     def get_cached_result(self, url):
         """Get cached result for URL"""
+        self.cache.move_to_end(url)
         return self.cache[url]['result']
     
     def cache_result(self, url, result):
-        """Cache analysis result"""
-        self.cache[url] = {
+        """Cache analysis result and append it to the cache log"""
+        entry = {
             'result': result,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': time.time()
         }
-        self.save_cache()
+        with self._cache_lock:
+            self.cache[url] = entry
+            self.cache.move_to_end(url)
+            if len(self.cache) > CACHE_MAX_ENTRIES:
+                self.cache.popitem(last=False)
+            self._cache_dirty = True
+            if not self._cache_writer:
+                return
+            try:
+                with open(self.cache_log_file, 'ab') as f:
+                    f.write(json_dumps({'url': url, 'entry': entry}) + b'\n')
+            except TypeError as e:
+                self.logger.error(f"Error logging cache entry (serialization failed): {e}")
+            except Exception as e:
+                self.logger.error(f"Unexpected error logging cache entry: {e}")
     
     def load_phishing_templates(self) -> dict:
         """Load known phishing template hashes - FIXED WITH VALID HASHES"""
@@ -200,12 +467,14 @@ class EnhancedVisualAnalyzer:
         templates_file = os.path.join(self.templates_dir, 'templates.json')
         if os.path.exists(templates_file):
             try:
-                with open(templates_file, 'r') as f:
-                    loaded_templates = json.load(f)
+                with open(templates_file, 'rb') as f:
+                    loaded_templates = json_loads(f.read())
                     # Validate loaded templates have valid hashes
                     for template_id, template_data in loaded_templates.items():
                         phash = template_data.get('phash', '')
-                        if len(phash) == 16 and all(c in '0123456789abcdef' for c in phash.lower()):
+                        if PHASH_HEX_RE.fullmatch(phash):
+                            if not template_data.get('ahash'):
+                                self.backfill_ahash(template_id, template_data)
                             templates[template_id] = template_data
                         else:
                             self.logger.warning(f"Invalid phash for template {template_id}: {phash}")
@@ -219,17 +488,69 @@ class EnhancedVisualAnalyzer:
         
         # Save updated templates
         try:
-            with open(templates_file, 'w') as f:
-                json.dump(templates, f, indent=2)
+            with open(templates_file, 'wb') as f:
+                f.write(json_dumps(templates, indent=True))
         except Exception as e:
             self.logger.error(f"Error saving templates: {e}")
         
         return templates
     
-    def setup_driver(self):
+    def backfill_ahash(self, template_id, template_data):
+        """Add the aHash to a template saved without one, if its source image is still on disk"""
+        image_path = template_data.get('image_path')
+        image = cv2.imread(image_path) if image_path and os.path.exists(image_path) else None
+        if image is None:
+            return
+        template_data['ahash'] = average_hash(prepare_image(image)['gray_8x8'])
+        self.logger.info(f"Backfilled aHash for template {template_id}")
+    
+    def index_templates(self):
+        """Pack template pHashes, aHashes and thresholds into parallel arrays for vectorized matching"""
+        template_ids, hashes, ahashes, thresholds = [], [], [], []
+        unscreened = []
+        for template_id, template_data in self.phishing_templates.items():
+            template_hash = template_data.get('phash')
+            if template_hash:
+                template_ids.append(template_id)
+                hashes.append(int(template_hash, 16))
+                thresholds.append(template_data.get('similarity_threshold', 0.8))
+                ahash = template_data.get('ahash')
+                if ahash and PHASH_HEX_RE.fullmatch(ahash):
+                    ahashes.append(int(ahash, 16))
+                else:
+                    ahashes.append(0)
+                    unscreened.append(template_id)
+        
+        self._template_ids = template_ids
+        self._template_hashes = np.array(hashes, dtype=np.uint64)
+        self._template_thresholds = np.array(thresholds, dtype=np.float64)
+        # Templates without an aHash can't be screened and are compared with every page
+        self._template_ahashes = np.array(ahashes, dtype=np.uint64)
+        self._template_unscreened = np.isin(template_ids, unscreened)
+        if unscreened:
+            self.logger.info(f"Templates without an aHash (compared with every page): {', '.join(unscreened)}")
+    
+    def ahash_candidates(self, image_ahash):
+        """Mask of the templates a page with this aHash could match: unscreened ones and those within AHASH_SCREEN_DISTANCE"""
+        if not image_ahash:
+            return np.ones(len(self._template_ids), dtype=bool)
+        distances = popcount_u64(self._template_ahashes ^ np.uint64(int(image_ahash, 16)))
+        return self._template_unscreened | (distances <= AHASH_SCREEN_DISTANCE)
+    
+    def _driver_alive(self, driver):
+        """True if the WebDriver session still responds"""
+        try:
+            return driver.session_id is not None and driver.current_url is not None
+        except WebDriverException:
+            return False
+    
+    def setup_driver(self, slot):
         """Setup Selenium WebDriver with optimized settings"""
-        if self.driver is not None:
-            return True
+        if slot.driver is not None:
+            # Reuse the running browser unless it is due for a restart or has died
+            if slot.requests < DRIVER_MAX_REQUESTS and self._driver_alive(slot.driver):
+                return True
+            self.cleanup_driver(slot)
         
         try:
             chrome_options = Options()
@@ -238,11 +559,18 @@ class EnhancedVisualAnalyzer:
             chrome_options.add_argument('--disable-dev-shm-usage')
             chrome_options.add_argument('--disable-gpu')
             chrome_options.add_argument('--disable-extensions')
+            chrome_options.add_argument('--disable-features=TranslateUI')
             chrome_options.add_argument('--window-size=1366,768')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.set_page_load_timeout(self.page_load_timeout)
+            slot.driver = webdriver.Chrome(options=chrome_options)
+            slot.driver.set_page_load_timeout(self.page_load_timeout)
+            
+            try:
+                slot.driver.execute_cdp_cmd('Network.enable', {})
+                slot.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+            except WebDriverException as e:
+                self.logger.warning(f"Could not set blocked URLs: {e}")
             
             return True
             
@@ -250,20 +578,35 @@ class EnhancedVisualAnalyzer:
             self.logger.error(f"Error setting up WebDriver: {e}")
             return False
     
-    def cleanup_driver(self):
-        """Clean up WebDriver"""
-        if self.driver:
-            try:
-                self.driver.quit()
-            except Exception:
-                pass
-            finally:
-                self.driver = None
-    
-    def take_screenshot(self, url):
-        """Take screenshot of the webpage"""
-        if not self.setup_driver():
-            return None
+    def cleanup_driver(self, slot=None):
+        """Clean up one pooled WebDriver, or all of them when no slot is given"""
+        for slot in ([slot] if slot is not None else self._driver_slots):
+            if slot.driver:
+                try:
+                    slot.driver.quit()
+                except Exception:
+                    pass
+                finally:
+                    slot.driver = None
+                    slot.requests = 0
+    
+    def _save_screenshot(self, path, png_bytes):
+        """Write an already encoded screenshot to disk (runs off the analysis thread)"""
+        try:
+            with open(path, 'wb') as f:
+                f.write(png_bytes)
+        except OSError as e:
+            self.logger.warning(f"Could not save screenshot {path}: {e}")
+    
+    def take_screenshot(self, url, slot):
+        """
+        Take screenshot of the webpage with the slot's driver. Returns
+        (screenshot_path, PNG bytes), or (None, None) on failure; the PNG is
+        written to screenshot_path in the background.
+        """
+        if not self.setup_driver(slot):
+            return None, None
+        driver = slot.driver
         
         try:
             url_hash = hashlib.md5(url.encode()).hexdigest()
@@ -271,89 +614,143 @@ class EnhancedVisualAnalyzer:
             screenshot_path = os.path.join(self.screenshots_dir, f"{url_hash}_{timestamp}.png")
             
             self.logger.info(f"Taking screenshot of {url}...")
-            self.driver.get(url)
+            slot.requests += 1
+            driver.get(url)
             
-            WebDriverWait(self.driver, self.screenshot_timeout).until(
+            WebDriverWait(driver, self.screenshot_timeout).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
             time.sleep(3)
             
-            if self.driver.save_screenshot(screenshot_path) and os.path.exists(screenshot_path):
-                self.logger.info(f"Screenshot saved: {screenshot_path}")
-                return screenshot_path
-            else:
-                self.logger.warning("Failed to save screenshot")
-                return None
+            # Capture straight to memory; the analysis never reads the file back
+            png_bytes = driver.get_screenshot_as_png()
+            threading.Thread(target=self._save_screenshot, args=(screenshot_path, png_bytes), daemon=True).start()
+            self.logger.info(f"Screenshot captured: {screenshot_path}")
+            return screenshot_path, png_bytes
                 
         except TimeoutException:
             self.logger.warning(f"Timeout while loading {url}")
-            return None
+            return None, None
         except WebDriverException as e:
             self.logger.warning(f"WebDriver error for {url}: {e}")
-            return None
+            # The browser may be in a bad state - start a fresh one next time
+            self.cleanup_driver(slot)
+            return None, None
         except Exception as e:
             self.logger.error(f"Unexpected error taking screenshot of {url}: {e}")
-            return None
+            return None, None
+    
+    def analyze_image(self, png_bytes):
+        """
+        pHash, aHash and dominant colors of a screenshot. Results are memoized by the
+        PNG's content, so redirects and mirrors rendering the same page reuse them.
+        """
+        key = hashlib.blake2b(png_bytes, digest_size=16).digest()
+        with self._content_cache_lock:
+            if key in self._content_cache:
+                self._content_cache.move_to_end(key)
+                return self._content_cache[key]
+        
+        image = cv2.imdecode(np.frombuffer(png_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("could not decode screenshot")
+        
+        views = prepare_image(image)
+        
+        # Cheap aHash screen first; the DCT-based pHash only runs for
+        # pages that could match a template
+        ahash = average_hash(views['gray_8x8'])
+        phash = self.calculate_phash(image) if self.ahash_candidates(ahash).any() else None
+        analysis = (phash, ahash, self.extract_dominant_colors(views['bgr_small']))
+        
+        with self._content_cache_lock:
+            self._content_cache[key] = analysis
+            if len(self._content_cache) > CONTENT_CACHE_SIZE:
+                self._content_cache.popitem(last=False)
+        return analysis
     
-    def extract_dominant_colors(self, image_path, num_colors=5):
-        """Extract dominant colors from screenshot using OpenCV"""
+    def extract_dominant_colors(self, image, num_colors=5, method=DOMINANT_COLOR_METHOD):
+        """Extract dominant colors from a screenshot (BGR array or file path) using a quantized color histogram or k-means"""
         try:
-            image = cv2.imread(image_path)
+            if isinstance(image, str):
+                image = cv2.imread(image)
             if image is None: return []
             
+            # UMat routes resize/cvtColor/calcHist through OpenCV's T-API, which
+            # runs them as OpenCL kernels when a device is available (CPU otherwise)
+            already_sampled = image.shape[:2] == COLOR_SAMPLE_SIZE[::-1]
+            image = cv2.UMat(image)
+            if not already_sampled:
+                image = cv2.resize(image, COLOR_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            pixels = image.reshape(-1, 3).astype(np.float32)
             
-            from sklearn.cluster import KMeans
-            kmeans = KMeans(n_clusters=num_colors, random_state=42, n_init='auto')
-            kmeans.fit(pixels)
+            if method == 'kmeans':
+                return self._kmeans_colors(image.get().reshape(-1, 3).astype(np.float32), num_colors)
             
-            colors = kmeans.cluster_centers_.astype(int)
-            labels = kmeans.labels_
-            label_counts = Counter(labels)
+            levels = 1 << COLOR_QUANT_BITS
+            hist = cv2.calcHist([image], [0, 1, 2], None, [levels] * 3, [0, 256] * 3)
+            counts = (hist.get() if isinstance(hist, cv2.UMat) else hist).ravel()
             
-            total_pixels = len(labels)
+            num_colors = min(num_colors, np.count_nonzero(counts))
+            top = np.argpartition(counts, -num_colors)[-num_colors:]
+            top = top[np.argsort(counts[top])[::-1]]
+            
+            # Report each bin by its center color
+            bin_width = 256 // levels
+            total_pixels = counts.sum()
             color_frequency = []
-            for i in range(num_colors):
-                color = tuple(colors[i])
-                frequency = label_counts[i] / total_pixels
-                color_frequency.append((color, frequency))
+            for bin_index in top:
+                color = tuple(int(level) * bin_width + bin_width // 2
+                              for level in np.unravel_index(bin_index, (levels,) * 3))
+                color_frequency.append((color, float(counts[bin_index] / total_pixels)))
             
-            color_frequency.sort(key=lambda x: x[1], reverse=True)
             return color_frequency
             
         except Exception as e:
-            self.logger.error(f"Error extracting colors from {image_path}: {e}")
+            self.logger.error(f"Error extracting dominant colors: {e}")
             return []
     
+    def _kmeans_colors(self, pixels, num_colors):
+        """Cluster (N, 3) float32 RGB pixels with cv2.kmeans; (color, frequency) sorted by frequency"""
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+        _, labels, centers = cv2.kmeans(pixels, num_colors, None, criteria, 3, cv2.KMEANS_PP_CENTERS)
+        counts = np.bincount(labels.ravel(), minlength=num_colors)
+        return [
+            (tuple(int(c) for c in centers[i]), float(counts[i] / labels.size))
+            for i in np.argsort(counts)[::-1]
+        ]
+    
     def detect_brand_impersonation(self, dominant_colors, url):
         """Detect brand impersonation using color analysis"""
         url_lower = url.lower()
         domain = urlparse(url).netloc.lower()
         impersonation_results = {}
         
-        for brand, brand_info in self.brand_colors.items():
+        # (N, 3) dominant colors and their (N,) frequencies
+        if dominant_colors:
+            colors = np.array([color for color, _ in dominant_colors], dtype=np.float32)
+            frequencies = np.array([frequency for _, frequency in dominant_colors], dtype=np.float32)
+        else:
+            colors = np.empty((0, 3), dtype=np.float32)
+            frequencies = np.empty(0, dtype=np.float32)
+        
+        # Brands are still all scored below - color matches alone can cross the threshold
+        brands_in_url = self.find_brands_in_url(url_lower)
+        
+        for brand, (brand_colors, tolerance) in self.brand_color_arrays.items():
             brand_score = 0.0
-            tolerance = brand_info.get('tolerance', 25)
             
-            brand_in_url = any(variant in url_lower for variant in [brand, brand.replace('o', '0'), brand + 'l'])
+            brand_in_url = brand in brands_in_url
             legitimate_domain = domain.endswith(f'.{brand}.com') or domain == f'{brand}.com'
             
             if brand_in_url and not legitimate_domain:
                 brand_score += 0.4
             
-            primary_colors = brand_info.get('primary', [])
-            secondary_colors = brand_info.get('secondary', [])
-            all_brand_colors = primary_colors + secondary_colors
-            
-            color_matches = 0
-            for color_tuple, frequency in dominant_colors:
-                for brand_color in all_brand_colors:
-                    distance = np.linalg.norm(np.array(color_tuple) - np.array(brand_color))
-                    if distance <= tolerance:
-                        color_matches += 1
-                        brand_score += frequency * 0.3
-                        break
+            # A dominant color matches if it is within tolerance of any brand color
+            distances = np.linalg.norm(colors[:, None, :] - brand_colors[None, :, :], axis=2)
+            matched = (distances <= tolerance).any(axis=1)
+            color_matches = int(matched.sum())
+            brand_score += float(frequencies[matched].sum()) * 0.3
             
             if color_matches >= 2:
                 brand_score += 0.2
@@ -382,86 +779,72 @@ class EnhancedVisualAnalyzer:
                 'all_matches': {}
             }
     
-    def calculate_phash(self, image_path):
-        """Calculate perceptual hash of an image"""
+    def calculate_phash(self, image):
+        """Calculate perceptual hash of an image (BGR or grayscale array, or file path)"""
         try:
-            with Image.open(image_path) as img:
-                return str(imagehash.phash(img))
+            if isinstance(image, str):
+                with Image.open(image) as img:
+                    return str(imagehash.phash(img))
+            if image.ndim == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            return str(imagehash.phash(Image.fromarray(image)))
         except Exception as e:
-            self.logger.error(f"Error calculating pHash for {image_path}: {e}")
+            self.logger.error(f"Error calculating pHash: {e}")
             return None
     
     def calculate_similarity(self, hash1, hash2):
         """Calculate similarity between two pHashes - FIXED"""
-        try:
-            # Validate hash format first
-            if not hash1 or not hash2:
-                return 0.0
-            
-            # Ensure hashes are strings and proper length
-            hash1_str = str(hash1).strip()
-            hash2_str = str(hash2).strip()
-            
-            # Check if hashes are valid hex strings of correct length (16 chars for pHash)
-            if len(hash1_str) != 16 or len(hash2_str) != 16:
-                self.logger.warning(f"Invalid hash length: {hash1_str} ({len(hash1_str)}), {hash2_str} ({len(hash2_str)})")
-                return 0.0
-            
-            # Check if all characters are valid hex
-            if not all(c in '0123456789abcdef' for c in hash1_str.lower()):
-                self.logger.warning(f"Invalid hex characters in hash1: {hash1_str}")
-                return 0.0
-            
-            if not all(c in '0123456789abcdef' for c in hash2_str.lower()):
-                self.logger.warning(f"Invalid hex characters in hash2: {hash2_str}")
-                return 0.0
-            
-            # Convert to ImageHash objects
-            h1 = imagehash.hex_to_hash(hash1_str)
-            h2 = imagehash.hex_to_hash(hash2_str)
-            
-            # Calculate Hamming distance
-            hamming_distance = h1 - h2
-            
-            # Convert to similarity (0.0 = no similarity, 1.0 = identical)
-            # For 16-char hex (64-bit hash), max distance is 64
-            max_distance = 64
-            similarity = 1.0 - (hamming_distance / max_distance)
-            
-            return max(0.0, similarity)
-            
-        except ValueError as e:
-            self.logger.error(f"Error calculating similarity (invalid hash format): {e}")
+        # Validate hash format first
+        if not hash1 or not hash2:
             return 0.0
-        except Exception as e:
-            self.logger.error(f"Unexpected error in similarity calculation: {e}")
+        
+        hash1_str = str(hash1).strip()
+        hash2_str = str(hash2).strip()
+        
+        # Both must be 16-char hex strings (64-bit pHash)
+        if not PHASH_HEX_RE.fullmatch(hash1_str) or not PHASH_HEX_RE.fullmatch(hash2_str):
+            self.logger.warning(f"Invalid pHash format: {hash1_str}, {hash2_str}")
             return 0.0
+        
+        # Hamming distance is the popcount of the XOR; max distance is 64
+        hamming_distance = (int(hash1_str, 16) ^ int(hash2_str, 16)).bit_count()
+        
+        # Convert to similarity (0.0 = no similarity, 1.0 = identical)
+        return 1.0 - hamming_distance / 64
     
-    def compare_with_templates(self, image_hash):
-        """Compare image hash with known phishing templates"""
+    def compare_with_templates(self, image_hash, image_ahash=None):
+        """Compare image hash with known phishing templates, skipping those the aHash screen rules out"""
         if not image_hash:
             return {'max_similarity': 0.0, 'matched_template': None, 'all_matches': []}
         
-        max_similarity = 0.0
         matched_template = None
         all_matches = []
         
-        for template_id, template_data in self.phishing_templates.items():
-            template_hash = template_data.get('phash')
-            if template_hash:
-                similarity = self.calculate_similarity(image_hash, template_hash)
-                
-                if similarity > max_similarity:
-                    max_similarity = similarity
-                
-                if similarity >= template_data.get('similarity_threshold', 0.8):
-                    match_info = {
-                        'template_id': template_id,
-                        'description': template_data.get('description', 'Unknown'),
-                        'similarity': similarity,
-                        'brand': template_data.get('brand', 'unknown')
-                    }
-                    all_matches.append(match_info)
+        image_hash = str(image_hash).strip()
+        if not PHASH_HEX_RE.fullmatch(image_hash):
+            self.logger.warning(f"Invalid image hash: {image_hash}")
+            return {'max_similarity': 0.0, 'matched_template': None, 'all_matches': all_matches}
+        
+        # Similarity to every template at once: 1 - Hamming distance / 64 bits
+        query = np.uint64(int(image_hash, 16))
+        popcount_xor = get_popcount_xor() if self._template_hashes.size >= NUMBA_MIN_TEMPLATES else None
+        if popcount_xor is not None:
+            distances = popcount_xor(self._template_hashes, query)
+        else:
+            distances = popcount_u64(self._template_hashes ^ query)
+        similarities = np.where(self.ahash_candidates(image_ahash), 1.0 - distances / 64, 0.0)
+        max_similarity = float(similarities.max()) if similarities.size else 0.0
+        
+        for i in np.flatnonzero(similarities >= self._template_thresholds):
+            template_id = self._template_ids[i]
+            template_data = self.phishing_templates[template_id]
+            match_info = {
+                'template_id': template_id,
+                'description': template_data.get('description', 'Unknown'),
+                'similarity': float(similarities[i]),
+                'brand': template_data.get('brand', 'unknown')
+            }
+            all_matches.append(match_info)
         
         if all_matches:
             # Find the best match among those that crossed the threshold
@@ -473,9 +856,9 @@ class EnhancedVisualAnalyzer:
             'all_matches': all_matches
         }
     
-    def analyze_visual_elements(self, url):
-        """Analyze visual elements of the webpage"""
-        if self.driver is None:
+    def analyze_visual_elements(self, url, driver):
+        """Analyze visual elements of the page currently loaded in driver"""
+        if driver is None:
             return {}
 
         analysis = {
@@ -486,18 +869,12 @@ class EnhancedVisualAnalyzer:
         }
         
         try:
-            forms = self.driver.find_elements(By.TAG_NAME, "form")
-            analysis['form_count'] = len(forms)
-            
-            password_fields = self.driver.find_elements(By.CSS_SELECTOR, "input[type='password']")
-            analysis['has_password_field'] = len(password_fields) > 0
-            
-            login_indicators = self.driver.find_elements(By.CSS_SELECTOR, "input[type='email'], input[name*='user'], input[name*='login']")
-            analysis['has_login_form'] = len(login_indicators) > 0 and analysis['has_password_field']
+            elements = driver.execute_script(PAGE_ELEMENTS_SCRIPT, list(SUSPICIOUS_KEYWORDS))
             
-            page_source = self.driver.page_source.lower()
-            suspicious_keywords = ['verify', 'account suspended', 'urgent', 'confirm', 'security alert', 'locked']
-            analysis['suspicious_keywords'] = [kw for kw in suspicious_keywords if kw in page_source]
+            analysis['form_count'] = elements['formCount']
+            analysis['has_password_field'] = elements['hasPassword']
+            analysis['has_login_form'] = elements['hasLoginInput'] and analysis['has_password_field']
+            analysis['suspicious_keywords'] = elements['keywordHits']
             
             return analysis
             
@@ -509,9 +886,10 @@ class EnhancedVisualAnalyzer:
         """Main function to get enhanced visual analysis features"""
         self.logger.info(f"Starting enhanced visual analysis for: {url}")
         
-        if self.is_cached(url):
-            self.logger.info("Using cached visual analysis result")
-            return self.get_cached_result(url)
+        with self._cache_lock:
+            if self.is_cached(url):
+                self.logger.info("Using cached visual analysis result")
+                return self.get_cached_result(url)
         
         result = {
             "visual_similarity_score": 0.0,
@@ -531,22 +909,25 @@ class EnhancedVisualAnalyzer:
             "error_message": None
         }
         
+        # Hold a pooled driver for the whole analysis - the element checks
+        # below read the page the screenshot loaded
+        slot = self.driver_pool.get()
         try:
             if np.random.random() < 0.1:
                 self.cleanup_old_screenshots()
             
-            screenshot_path = self.take_screenshot(url)
+            screenshot_path, png_bytes = self.take_screenshot(url, slot)
             
             if screenshot_path:
                 result["screenshot_path"] = screenshot_path
                 
-                phash = self.calculate_phash(screenshot_path)
+                phash, ahash, dominant_colors = self.analyze_image(png_bytes)
                 result["phash"] = phash
                 
-                dominant_colors = self.extract_dominant_colors(screenshot_path)
-                # Convert NumPy types to native Python types for JSON serialization
+                # extract_dominant_colors already yields Python ints/floats, and
+                # json_dumps handles NumPy values anyway - no per-value conversion
                 result["dominant_colors"] = [
-                    {"color": [int(c) for c in color], "frequency": float(freq)} 
+                    {"color": list(color), "frequency": freq}
                     for color, freq in dominant_colors
                 ]
                 
@@ -554,7 +935,7 @@ class EnhancedVisualAnalyzer:
                 result["brand_analysis"] = brand_analysis
                 
                 if phash:
-                    template_comparison = self.compare_with_templates(phash)
+                    template_comparison = self.compare_with_templates(phash, ahash)
                     result["visual_similarity_score"] = template_comparison["max_similarity"]
                     result["matched_template"] = template_comparison["matched_template"]
                     result["template_matches"] = template_comparison["all_matches"]
@@ -563,7 +944,7 @@ class EnhancedVisualAnalyzer:
                     impersonation_boost = brand_analysis["confidence"] * 0.6
                     result["visual_similarity_score"] = max(result["visual_similarity_score"], impersonation_boost)
                 
-                visual_elements = self.analyze_visual_elements(url)
+                visual_elements = self.analyze_visual_elements(url, slot.driver)
                 result["visual_elements"] = visual_elements
                 
                 element_risk = 0.0
@@ -592,13 +973,19 @@ class EnhancedVisualAnalyzer:
             result["visual_similarity_score"] = 0.0
             result["analysis_success"] = False
             self.logger.error(error_msg)
+            self.cleanup_driver(slot)
         
         finally:
-            self.cleanup_driver()
+            self.driver_pool.put(slot)
         
         self.cache_result(url, result)
         return result
     
+    def get_features_batch(self, urls) -> list:
+        """Analyze several URLs concurrently, one pooled driver per worker; results keep input order"""
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return list(executor.map(self.get_features, urls))
+    
     def cleanup_old_screenshots(self, days_old=7):
         """Clean up old screenshot files"""
         try:
@@ -612,23 +999,29 @@ class EnhancedVisualAnalyzer:
     
     def add_phishing_template(self, template_id, image_path, description, brand=None, similarity_threshold=0.85):
         """Add a new phishing template from an image file"""
-        phash = self.calculate_phash(image_path)
+        # Hash the template exactly like screenshots are hashed in analyze_image
+        image = cv2.imread(image_path)
+        views = prepare_image(image) if image is not None else None
+        phash = self.calculate_phash(image) if views else None
         if not phash:
             self.logger.error(f"Failed to calculate hash for {image_path}")
             return False
             
         self.phishing_templates[template_id] = {
             'phash': phash,
+            'ahash': average_hash(views['gray_8x8']),
+            'image_path': os.path.abspath(image_path),
             'description': description,
             'brand': brand,
             'similarity_threshold': similarity_threshold,
             'added_date': datetime.now().isoformat()
         }
+        self.index_templates()
         
         templates_file = os.path.join(self.templates_dir, 'templates.json')
         try:
-            with open(templates_file, 'w') as f:
-                json.dump(self.phishing_templates, f, indent=2)
+            with open(templates_file, 'wb') as f:
+                f.write(json_dumps(self.phishing_templates, indent=True))
             self.logger.info(f"Added phishing template: {template_id}")
             return True
         except Exception as e:
@@ -637,19 +1030,27 @@ class EnhancedVisualAnalyzer:
 
 # Global analyzer instance (singleton pattern for efficiency)
 _enhanced_visual_analyzer = None
+_analyzer_lock = threading.Lock()
 
 def get_visual_analyzer():
     """Get global enhanced visual analyzer instance"""
     global _enhanced_visual_analyzer
     if _enhanced_visual_analyzer is None:
-        _enhanced_visual_analyzer = EnhancedVisualAnalyzer()
+        with _analyzer_lock:
+            if _enhanced_visual_analyzer is None:
+                _enhanced_visual_analyzer = EnhancedVisualAnalyzer()
     return _enhanced_visual_analyzer
 
 def get_features(url: str) -> dict:
-    """Main function that integrates with your existing analyzer system"""
+    """Main function that integrates with your existing analyzer system (thread-safe)"""
     analyzer = get_visual_analyzer()
     return analyzer.get_features(url)
 
+def get_features_batch(urls) -> list:
+    """Visual features for several URLs, captured concurrently"""
+    analyzer = get_visual_analyzer()
+    return analyzer.get_features_batch(urls)
+
 # Cleanup function for graceful shutdown
 def cleanup():
     """Cleanup function to call on application shutdown"""
@@ -11,116 +11,104 @@ Features:
 - Bulk analysis capabilities
 """
 
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, request, jsonify, make_response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import gzip
+import importlib.util
 import os
 import sys
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Add current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import our enhanced components
 try:
-    from services.enhanced_url_checker import EnhancedURLChecker
+    from analyzers.common import build_http_session
     from routes.url_routes import url_bp
 except ImportError as e:
     print(f"❌ Import error: {e}")
     print("Make sure all required files are in the correct directories")
     sys.exit(1)
 
-def create_app():
-    """Create and configure Flask application"""
-    app = Flask(__name__)
-    
-    # Enable CORS for all routes
-    CORS(app, origins=["*"])
-    
-    # Configuration
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-    app.config['JSON_SORT_KEYS'] = False
-    
-    # Setup logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # Register blueprints
-    app.register_blueprint(url_bp, url_prefix='/api')
-    
-    # Root endpoint with API documentation
-    @app.route('/')
-    def index():
-        """API documentation and status page"""
-        html_template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Enhanced URL Fraud Detection API</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
-                .container { max-width: 1200px; margin: 0 auto; background: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-                .header { text-align: center; margin-bottom: 40px; }
-                .title { color: #2c3e50; margin-bottom: 10px; }
-                .subtitle { color: #7f8c8d; }
-                .section { margin: 30px 0; }
-                .endpoint { background: #ecf0f1; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #3498db; }
-                .method { background: #3498db; color: white; padding: 2px 8px; border-radius: 3px; font-size: 12px; }
-                .method.post { background: #e74c3c; }
-                .method.get { background: #27ae60; }
-                .example { background: #2c3e50; color: #ecf0f1; padding: 15px; border-radius: 5px; font-family: monospace; font-size: 14px; overflow-x: auto; }
-                .feature { background: #fff; border: 1px solid #ddd; padding: 15px; margin: 10px; border-radius: 5px; }
-                .grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; }
-                .status { padding: 10px; border-radius: 5px; margin: 10px 0; }
-                .status.online { background: #d5f4e6; color: #27ae60; }
-                .status.offline { background: #fad5d5; color: #e74c3c; }
-                .analyzer-weights { display: grid; grid-template-columns: repeat(4, 1fr); gap: 15px; margin: 20px 0; }
-                .weight-card { text-align: center; padding: 15px; background: #3498db; color: white; border-radius: 5px; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1 class="title">🛡️ Enhanced URL Fraud Detection API</h1>
-                    <p class="subtitle">Multi-Modal Analysis with Brand Impersonation Detection</p>
-                    <div class="status online">✅ System Online - {{ timestamp }}</div>
-                </div>
+# API documentation page - static apart from the server timestamp, so the
+# halves around it are encoded once and the page is re-rendered and gzipped
+# at most once a minute
+INDEX_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Enhanced URL Fraud Detection API</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
+        .container { max-width: 1200px; margin: 0 auto; background: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        .header { text-align: center; margin-bottom: 40px; }
+        .title { color: #2c3e50; margin-bottom: 10px; }
+        .subtitle { color: #7f8c8d; }
+        .section { margin: 30px 0; }
+        .endpoint { background: #ecf0f1; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #3498db; }
+        .method { background: #3498db; color: white; padding: 2px 8px; border-radius: 3px; font-size: 12px; }
+        .method.post { background: #e74c3c; }
+        .method.get { background: #27ae60; }
+        .example { background: #2c3e50; color: #ecf0f1; padding: 15px; border-radius: 5px; font-family: monospace; font-size: 14px; overflow-x: auto; }
+        .feature { background: #fff; border: 1px solid #ddd; padding: 15px; margin: 10px; border-radius: 5px; }
+        .grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; }
+        .status { padding: 10px; border-radius: 5px; margin: 10px 0; }
+        .status.online { background: #d5f4e6; color: #27ae60; }
+        .status.offline { background: #fad5d5; color: #e74c3c; }
+        .analyzer-weights { display: grid; grid-template-columns: repeat(4, 1fr); gap: 15px; margin: 20px 0; }
+        .weight-card { text-align: center; padding: 15px; background: #3498db; color: white; border-radius: 5px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1 class="title">🛡️ Enhanced URL Fraud Detection API</h1>
+            <p class="subtitle">Multi-Modal Analysis with Brand Impersonation Detection</p>
+            <div class="status online">✅ System Online - {{ timestamp }}</div>
+        </div>
 
-                <div class="section">
-                    <h2>🔍 Analysis Components</h2>
-                    <div class="analyzer-weights">
-                        <div class="weight-card">
-                            <h3>Reputation</h3>
-                            <p><strong>35%</strong></p>
-                            <small>VirusTotal API</small>
-                        </div>
-                        <div class="weight-card">
-                            <h3>Domain</h3>
-                            <p><strong>25%</strong></p>
-                            <small>WHOIS + SSL</small>
-                        </div>
-                        <div class="weight-card">
-                            <h3>Content</h3>
-                            <p><strong>20%</strong></p>
-                            <small>Pattern Analysis</small>
-                        </div>
-                        <div class="weight-card">
-                            <h3>Visual</h3>
-                            <p><strong>20%</strong></p>
-                            <small>Brand Detection</small>
-                        </div>
-                    </div>
+        <div class="section">
+            <h2>🔍 Analysis Components</h2>
+            <div class="analyzer-weights">
+                <div class="weight-card">
+                    <h3>Reputation</h3>
+                    <p><strong>35%</strong></p>
+                    <small>VirusTotal API</small>
+                </div>
+                <div class="weight-card">
+                    <h3>Domain</h3>
+                    <p><strong>25%</strong></p>
+                    <small>WHOIS + SSL</small>
                 </div>
+                <div class="weight-card">
+                    <h3>Content</h3>
+                    <p><strong>20%</strong></p>
+                    <small>Pattern Analysis</small>
+                </div>
+                <div class="weight-card">
+                    <h3>Visual</h3>
+                    <p><strong>20%</strong></p>
+                    <small>Brand Detection</small>
+                </div>
+            </div>
+        </div>
 
-                <div class="section">
-                    <h2>📡 API Endpoints</h2>
-                    
-                    <div class="endpoint">
-                        <span class="method post">POST</span> <strong>/api/analyze_url</strong>
-                        <p>Analyze a single URL for fraud indicators with security report format</p>
-                        <div class="example">
+        <div class="section">
+            <h2>📡 API Endpoints</h2>
+            
+            <div class="endpoint">
+                <span class="method post">POST</span> <strong>/api/analyze_url</strong>
+                <p>Analyze a single URL for fraud indicators with security report format</p>
+                <div class="example">
 POST /api/analyze_url
 Content-Type: application/json
 
@@ -143,12 +131,12 @@ Response Format:
   "user_tip": "Contextual advice for the user"
 }
                         </div>
-                    </div>
+            </div>
 
-                    <div class="endpoint">
-                        <span class="method post">POST</span> <strong>/api/bulk_analyze</strong>
-                        <p>Analyze multiple URLs (max 50 per request)</p>
-                        <div class="example">
+            <div class="endpoint">
+                <span class="method post">POST</span> <strong>/api/bulk_analyze</strong>
+                <p>Analyze multiple URLs (max 50 per request)</p>
+                <div class="example">
 POST /api/bulk_analyze
 Content-Type: application/json
 
@@ -156,28 +144,39 @@ Content-Type: application/json
     "urls": ["https://site1.com", "https://site2.com"]
 }
                         </div>
-                    </div>
+            </div>
 
-                    <div class="endpoint">
-                        <span class="method get">GET</span> <strong>/api/analyzer_status</strong>
-                        <p>Check system status and analyzer availability</p>
-                    </div>
+            <div class="endpoint">
+                <span class="method post">POST</span> <strong>/api/content_batch</strong>
+                <p>Score many URLs with the content analyzer only (batched through the ML model)</p>
+                <div class="example">
+POST /api/content_batch
+Content-Type: application/json
 
-                    <div class="endpoint">
-                        <span class="method get">GET</span> <strong>/api/demo</strong>
-                        <p>Run demo analysis on sample URLs</p>
-                    </div>
+["https://site1.com", "https://site2.com"]
+                        </div>
+            </div>
 
-                    <div class="endpoint">
-                        <span class="method get">GET</span> <strong>/api/health</strong>
-                        <p>Health check endpoint</p>
-                    </div>
-                </div>
+            <div class="endpoint">
+                <span class="method get">GET</span> <strong>/api/analyzer_status</strong>
+                <p>Check system status and analyzer availability</p>
+            </div>
+
+            <div class="endpoint">
+                <span class="method get">GET</span> <strong>/api/demo</strong>
+                <p>Run demo analysis on sample URLs</p>
+            </div>
+
+            <div class="endpoint">
+                <span class="method get">GET</span> <strong>/api/health</strong>
+                <p>Health check endpoint</p>
+            </div>
+        </div>
 
-                <div class="section">
-                    <h2>🎯 Security Report Format</h2>
-                    <p>All analysis endpoints now return a standardized security report with:</p>
-                    <div class="example">
+        <div class="section">
+            <h2>🎯 Security Report Format</h2>
+            <p>All analysis endpoints now return a standardized security report with:</p>
+            <div class="example">
 {
   "url": "analyzed URL",
   "overall_status": "legitimate|suspicious|risky",
@@ -210,41 +209,41 @@ Content-Type: application/json
   "user_tip": "contextual advice based on risk level"
 }
                     </div>
-                </div>
+        </div>
 
-                <div class="section">
-                    <h2>🚀 Key Features</h2>
-                    <div class="grid">
-                        <div class="feature">
-                            <h3>🌍 Domain Analysis</h3>
-                            <p>WHOIS lookup, domain age verification, SSL certificate validation</p>
-                        </div>
-                        <div class="feature">
-                            <h3>📝 Content Analysis</h3>
-                            <p>URL pattern matching, suspicious keyword detection, ML classification</p>
-                        </div>
-                        <div class="feature">
-                            <h3>🛡️ Reputation Check</h3>
-                            <p>VirusTotal API integration for threat intelligence</p>
-                        </div>
-                        <div class="feature">
-                            <h3>👁️ Visual Analysis</h3>
-                            <p>Screenshot capture, brand impersonation detection using color analysis</p>
-                        </div>
-                        <div class="feature">
-                            <h3>🎯 Security Reports</h3>
-                            <p>Standardized JSON format with detailed breakdowns and user guidance</p>
-                        </div>
-                        <div class="feature">
-                            <h3>🔍 Fraud Classification</h3>
-                            <p>Automatic classification: Phishing, Scam, Malware, or Clone site</p>
-                        </div>
-                    </div>
+        <div class="section">
+            <h2>🚀 Key Features</h2>
+            <div class="grid">
+                <div class="feature">
+                    <h3>🌍 Domain Analysis</h3>
+                    <p>WHOIS lookup, domain age verification, SSL certificate validation</p>
+                </div>
+                <div class="feature">
+                    <h3>📝 Content Analysis</h3>
+                    <p>URL pattern matching, suspicious keyword detection, ML classification</p>
+                </div>
+                <div class="feature">
+                    <h3>🛡️ Reputation Check</h3>
+                    <p>VirusTotal API integration for threat intelligence</p>
+                </div>
+                <div class="feature">
+                    <h3>👁️ Visual Analysis</h3>
+                    <p>Screenshot capture, brand impersonation detection using color analysis</p>
+                </div>
+                <div class="feature">
+                    <h3>🎯 Security Reports</h3>
+                    <p>Standardized JSON format with detailed breakdowns and user guidance</p>
+                </div>
+                <div class="feature">
+                    <h3>🔍 Fraud Classification</h3>
+                    <p>Automatic classification: Phishing, Scam, Malware, or Clone site</p>
                 </div>
+            </div>
+        </div>
 
-                <div class="section">
-                    <h2>⚙️ Setup Instructions</h2>
-                    <div class="example">
+        <div class="section">
+            <h2>⚙️ Setup Instructions</h2>
+            <div class="example">
 # 1. Install dependencies
 pip install flask flask-cors selenium opencv-python scikit-learn
 pip install pillow imagehash requests beautifulsoup4 python-whois
@@ -258,30 +257,104 @@ pip install chromedriver-autoinstaller
 # 4. Run the application
 python app.py
                     </div>
-                </div>
+        </div>
 
-                <div class="section">
-                    <h2>📊 Risk Categories</h2>
-                    <div class="grid">
-                        <div class="feature" style="border-left-color: #27ae60;">
-                            <h3>✅ Legitimate (0-25)</h3>
-                            <p>Safe to visit, no fraud indicators detected</p>
-                        </div>
-                        <div class="feature" style="border-left-color: #f39c12;">
-                            <h3>⚠️ Suspicious (25-60)</h3>
-                            <p>Some risk indicators present, proceed with caution</p>
-                        </div>
-                        <div class="feature" style="border-left-color: #e74c3c;">
-                            <h3>❌ Risky (60-100)</h3>
-                            <p>High fraud probability, avoid visiting</p>
-                        </div>
-                    </div>
+        <div class="section">
+            <h2>📊 Risk Categories</h2>
+            <div class="grid">
+                <div class="feature" style="border-left-color: #27ae60;">
+                    <h3>✅ Legitimate (0-25)</h3>
+                    <p>Safe to visit, no fraud indicators detected</p>
+                </div>
+                <div class="feature" style="border-left-color: #f39c12;">
+                    <h3>⚠️ Suspicious (25-60)</h3>
+                    <p>Some risk indicators present, proceed with caution</p>
+                </div>
+                <div class="feature" style="border-left-color: #e74c3c;">
+                    <h3>❌ Risky (60-100)</h3>
+                    <p>High fraud probability, avoid visiting</p>
                 </div>
             </div>
-        </body>
-        </html>
-        """
-        return render_template_string(html_template, timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC"))
+        </div>
+    </div>
+</body>
+</html>
+"""
+INDEX_HEAD, INDEX_TAIL = (part.encode('utf-8') for part in INDEX_HTML.split('{{ timestamp }}'))
+INDEX_MAX_AGE = 60
+
+_index_page = (None, b'', b'')  # (minute rendered, html bytes, gzipped bytes)
+
+def index_page() -> tuple:
+    """Returns (html bytes, gzipped html bytes), rendered on the first request of each minute"""
+    global _index_page
+    now = datetime.now(timezone.utc)
+    page = _index_page
+    if page[0] != now.strftime("%Y-%m-%d %H:%M"):
+        html = INDEX_HEAD + now.strftime("%Y-%m-%d %H:%M:%S UTC").encode() + INDEX_TAIL
+        page = _index_page = (now.strftime("%Y-%m-%d %H:%M"), html, gzip.compress(html, compresslevel=9))
+    return page[1], page[2]
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Types orjson can't encode go through
+    Flask's default hook (Decimal, __html__ objects); keys are left unsorted.
+    """
+    def _dumps_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self._dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj), mimetype=self.mimetype)
+
+def create_app():
+    """Create and configure Flask application"""
+    app = Flask(__name__)
+    
+    # jsonify/request.get_json via orjson when installed
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
+    
+    # Enable CORS for all routes
+    CORS(app, origins=["*"])
+    
+    # Configuration
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['JSON_SORT_KEYS'] = False
+    
+    # Setup logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # One pooled keep-alive session for outbound HTTP, injected into the URL checker
+    app.extensions['http'] = build_http_session()
+    
+    # Register blueprints
+    app.register_blueprint(url_bp, url_prefix='/api')
+    
+    # Root endpoint with API documentation
+    @app.route('/')
+    def index():
+        """API documentation and status page"""
+        html, html_gz = index_page()
+        if 'gzip' in request.accept_encodings:
+            response = make_response(html_gz)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = make_response(html)
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        response.headers['Cache-Control'] = f'public, max-age={INDEX_MAX_AGE}'
+        response.vary.add('Accept-Encoding')
+        return response
     
     # Global error handlers
     @app.errorhandler(400)
@@ -298,35 +371,89 @@ python app.py
     
     return app
 
-def main():
-    """Main function to run the Flask application"""
-    print("🚀 Starting Enhanced URL Fraud Detection System")
-    print("=" * 60)
-    
-    # Check dependencies
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 5001
+
+# gunicorn sizing: each worker process runs its own visual analyzer with a pool
+# of DRIVER_POOL_SIZE Chrome instances, so workers stay few (WEB_CONCURRENCY
+# overrides) and concurrency comes from threads - the requests are I/O bound
+SERVER_WORKERS = int(os.getenv('WEB_CONCURRENCY', 2))
+SERVER_THREADS = 16
+
+def serve(app):
+    """
+    Serve the app with gunicorn (gthread workers), falling back to waitress and
+    then to Flask's development server when neither is installed
+    """
     try:
-        import cv2
-        print("✅ OpenCV available for visual analysis")
+        from gunicorn.app.base import BaseApplication
     except ImportError:
-        print("⚠️  OpenCV not available - install with: pip install opencv-python")
-    
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class GunicornApplication(BaseApplication):
+            def __init__(self, application, options):
+                self.application = application
+                self.options = options
+                super().__init__()
+
+            def load_config(self):
+                for key, value in self.options.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return self.application
+
+        options = {
+            'bind': f"{SERVER_HOST}:{SERVER_PORT}",
+            'workers': SERVER_WORKERS,
+            'worker_class': 'gthread',
+            'threads': SERVER_THREADS,
+            'keepalive': 30,
+            'timeout': 60,
+        }
+        print(f"🦄 gunicorn: {options['workers']} workers x {options['threads']} threads")
+        GunicornApplication(app, options).run()
+        return
+
     try:
-        import selenium
-        print("✅ Selenium available for screenshots")
+        from waitress import serve as waitress_serve
     except ImportError:
-        print("⚠️  Selenium not available - install with: pip install selenium")
+        waitress_serve = None
+
+    if waitress_serve is not None:
+        print("🍵 waitress: 32 threads")
+        waitress_serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=32)
+        return
+
+    print("⚠️  gunicorn/waitress not installed - using Flask development server")
+    app.run(host=SERVER_HOST, port=SERVER_PORT, debug=False, threaded=True)
+
+def main():
+    """Main function to run the Flask application"""
+    print("🚀 Starting Enhanced URL Fraud Detection System")
+    print("=" * 60)
     
-    try:
-        from sklearn.cluster import KMeans
-        print("✅ Scikit-learn available for color analysis")
-    except ImportError:
-        print("⚠️  Scikit-learn not available - install with: pip install scikit-learn")
+    # Check dependencies - find_spec only locates the module; the heavy imports
+    # happen on the first request that needs them
+    dependencies = [
+        ('cv2', "OpenCV available for visual analysis", "OpenCV", 'opencv-python'),
+        ('selenium', "Selenium available for screenshots", "Selenium", 'selenium'),
+        ('sklearn', "Scikit-learn available for the domain and content models", "Scikit-learn", 'scikit-learn'),
+    ]
+    for module, available, name, package in dependencies:
+        if importlib.util.find_spec(module) is not None:
+            print(f"✅ {available}")
+        else:
+            print(f"⚠️  {name} not available - install with: pip install {package}")
     
-    # Create directories
-    directories = ['models', 'visual_data', 'visual_data/screenshots', 'visual_data/cache']
+    # Create directories - leaves only, parents come with them
+    directories = ['models', 'visual_data/screenshots', 'visual_data/cache']
     for directory in directories:
-        os.makedirs(directory, exist_ok=True)
-        print(f"✅ Directory ready: {directory}")
+        path = Path(directory)
+        if not path.is_dir():
+            path.mkdir(parents=True, exist_ok=True)
+    print(f"✅ Directories ready: {', '.join(directories)}")
     
     # Create Flask app
     app = create_app()
@@ -357,12 +484,7 @@ def main():
     print(f"\n⚡ Starting server...")
     
     try:
-        app.run(
-            host="0.0.0.0", 
-            port=5001, 
-            debug=False,  # Set to False for production
-            threaded=True
-        )
+        serve(app)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except Exception as e:
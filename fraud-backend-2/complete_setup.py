@@ -8,6 +8,8 @@ import os
 import sys
 import subprocess
 import json
+import tempfile
+import importlib.util
 from pathlib import Path
 
 def print_banner():
@@ -53,12 +55,34 @@ def install_requirements():
         'chromedriver-autoinstaller>=0.6.0'
     ]
     
+    # --prefer-binary, not --only-binary=:all: - python-whois and other
+    # pure-Python packages here aren't reliably published as wheels, and with
+    # :all: one missing wheel fails the whole batch
+    pip_install = [sys.executable, '-m', 'pip', 'install', '--prefer-binary']
+    
+    # One pip run for the whole set: a single resolver pass and one process
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(requirements) + '\n')
+        requirements_path = f.name
+    
+    try:
+        print(f"Installing {len(requirements)} packages...")
+        subprocess.check_call(pip_install + ['-r', requirements_path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print("✅ All packages installed successfully!")
+        return True
+    except subprocess.CalledProcessError:
+        print("⚠️  Batch install failed - retrying packages individually")
+    finally:
+        os.remove(requirements_path)
+    
+    # pip installs nothing when resolution fails, so find the culprits one by one
     failed_packages = []
     
     for package in requirements:
         try:
             print(f"Installing {package}...")
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', package], 
+            subprocess.check_call(pip_install + [package], 
                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             print(f"✅ {package}")
         except subprocess.CalledProcessError:
@@ -114,17 +138,16 @@ def create_directory_structure():
     print("\n📁 Creating Directory Structure...")
     print("-" * 35)
     
+    # Leaf directories only - mkdir(parents=True) creates data/ and visual_data/
     directories = [
         'analyzers',
         'services', 
         'routes',
         'models',
-        'data',
         'data/raw',
         'data/processed',
         'data/phishing',
         'data/legitimate',
-        'visual_data',
         'visual_data/screenshots',
         'visual_data/phishing_templates',
         'visual_data/cache',
@@ -132,7 +155,9 @@ def create_directory_structure():
     ]
     
     for directory in directories:
-        os.makedirs(directory, exist_ok=True)
+        path = Path(directory)
+        if not path.is_dir():
+            path.mkdir(parents=True, exist_ok=True)
         print(f"✅ Created: {directory}/")
     
     # Create __init__.py files for Python packages
@@ -263,11 +288,10 @@ def run_system_test():
         ]
         
         for module, description in test_imports:
-            try:
-                __import__(module)
+            if importlib.util.find_spec(module) is not None:
                 print(f"✅ {module} - {description}")
-            except ImportError as e:
-                print(f"❌ {module} - {description} - {e}")
+            else:
+                print(f"❌ {module} - {description} - not installed")
                 return False
         
         # Test ChromeDriver
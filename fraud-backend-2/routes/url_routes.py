@@ -1,6 +1,8 @@
 # routes/url_routes.py - FIXED VERSION
-from flask import Blueprint, request, jsonify
-from services.enhanced_url_checker import EnhancedURLChecker, format_detailed_console_output
+from flask import Blueprint, request, jsonify, current_app
+from urllib.parse import urlsplit
+from cachetools import TTLCache
+import threading
 import time
 import logging
 
@@ -8,22 +10,75 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-print("🚀 Initializing Enhanced URL Fraud Detection System...")
-try:
-    checker = EnhancedURLChecker()
-    print("✅ System ready!")
-except Exception as e:
-    print(f"❌ Failed to initialize checker: {e}")
-    checker = None
+# URL checker, built on first use so workers that only serve the index page or
+# health checks never import Selenium/OpenCV/sklearn
+_checker = None
+_checker_error = None
+_checker_lock = threading.Lock()
+
+def _get_checker():
+    """
+    Returns the shared EnhancedURLChecker, building it on first use. Returns None
+    when initialization fails; the failure is not cached, so the next call retries.
+    """
+    global _checker, _checker_error
+    if _checker is None:
+        with _checker_lock:
+            if _checker is None:
+                logger.info("Initializing Enhanced URL Fraud Detection System...")
+                try:
+                    from services.enhanced_url_checker import EnhancedURLChecker
+                    _checker = EnhancedURLChecker(session=current_app.extensions.get('http'))
+                    _checker_error = None
+                    logger.info("System ready")
+                except Exception as e:
+                    _checker_error = str(e)
+                    logger.error(f"Failed to initialize checker: {e}", exc_info=True)
+    return _checker
 
 url_bp = Blueprint("url_routes", __name__)
 
+# Verdicts stay valid for minutes to hours, so repeated lookups of the same
+# URL are answered from here instead of re-running WHOIS/Selenium/VirusTotal
+REPORT_CACHE = TTLCache(maxsize=10_000, ttl=3600)
+_report_cache_lock = threading.Lock()
+REPORT_MAX_AGE = 600  # Cache-Control max-age for successful reports
+
+def _report_cache_key(url: str) -> str:
+    """Normalizes a URL for the report cache: lowercase scheme and host, no fragment"""
+    split = urlsplit(url)
+    key = f"{split.scheme.lower()}://{split.netloc.lower()}{split.path or '/'}"
+    return f"{key}?{split.query}" if split.query else key
+
+def _cached_report(url: str):
+    """Returns the cached report for a URL, or None"""
+    with _report_cache_lock:
+        return REPORT_CACHE.get(_report_cache_key(url))
+
+def _store_report(url: str, report: dict):
+    """Caches a report; error reports are not cached so they are retried"""
+    if report.get("overall_status") != "error":
+        with _report_cache_lock:
+            REPORT_CACHE[_report_cache_key(url)] = report
+
+def _check_url_cached(checker, url: str) -> dict:
+    """check_url_risk through REPORT_CACHE"""
+    report = _cached_report(url)
+    if report is None:
+        report = checker.check_url_risk(url)
+        _store_report(url, report)
+    return report
+
+# Number of URLs sent through the content vectorizer/model per call
+CONTENT_BATCH_SIZE = 1024
+
 @url_bp.route("/analyze_url", methods=["POST"])
 def analyze_url_endpoint():
     """
     Enhanced URL analysis endpoint with proper error handling.
     """
     try:
+        checker = _get_checker()
         # Check if checker is initialized
         if not checker:
             return jsonify({
@@ -46,7 +101,7 @@ def analyze_url_endpoint():
         
         # Perform analysis
         logger.info(f"Analyzing URL: {url}")
-        final_report = checker.check_url_risk(url)
+        final_report = _check_url_cached(checker, url)
         
         # Log summary for debugging
         print(f"✅ Analysis complete for {url}")
@@ -54,7 +109,10 @@ def analyze_url_endpoint():
         print(f"   Risk Score: {final_report.get('risk_score')}%")
         print(f"   Time: {final_report.get('analysis_time')}s")
         
-        return jsonify(final_report)
+        response = jsonify(final_report)
+        if final_report.get('overall_status') != 'error':
+            response.headers['Cache-Control'] = f'public, max-age={REPORT_MAX_AGE}'
+        return response
         
     except Exception as e:
         logger.error(f"Error in /analyze_url endpoint: {e}", exc_info=True)
@@ -69,6 +127,7 @@ def bulk_analyze_endpoint():
     Analyze multiple URLs at once.
     """
     try:
+        checker = _get_checker()
         if not checker:
             return jsonify({
                 "error": "System not initialized",
@@ -86,24 +145,24 @@ def bulk_analyze_endpoint():
         if len(urls) > 50:
             return jsonify({"error": "Maximum 50 URLs allowed per request"}), 400
         
-        results = []
+        cleaned = []
         for url in urls[:50]:  # Safety limit
             if url and isinstance(url, str):
                 url = url.strip()
                 if not url.startswith(('http://', 'https://')):
                     url = 'https://' + url
-                
-                try:
-                    result = checker.check_url_risk(url)
-                    results.append(result)
-                except Exception as e:
-                    results.append({
-                        "url": url,
-                        "overall_status": "error",
-                        "risk_score": -1,
-                        "reason": f"Analysis failed: {str(e)}",
-                        "error": str(e)
-                    })
+                cleaned.append(url)
+        
+        # Cache hits are served directly; the rest go through the batch path
+        # (batched Safe Browsing/VirusTotal and network fetches, then a thread pool)
+        reports = [_cached_report(url) for url in cleaned]
+        fresh = iter(checker.check_urls_risk([url for url, report in zip(cleaned, reports) if report is None]))
+        results = []
+        for url, report in zip(cleaned, reports):
+            if report is None:
+                report = next(fresh)
+                _store_report(url, report)
+            results.append(report)
         
         return jsonify({
             "success": True,
@@ -118,12 +177,47 @@ def bulk_analyze_endpoint():
             "details": str(e)
         }), 500
 
+@url_bp.route("/content_batch", methods=["POST"])
+def content_batch_endpoint():
+    """
+    Score many URLs with the content analyzer only, batching them through the model.
+    Accepts either a JSON list of URLs or {"urls": [...]}.
+    """
+    try:
+        from analyzers import content_analyzer
+        
+        data = request.get_json()
+        urls = data if isinstance(data, list) else (data or {}).get("urls")
+        if urls is None:
+            return jsonify({"error": "URLs list is required"}), 400
+        
+        if not isinstance(urls, list):
+            return jsonify({"error": "URLs must be a list"}), 400
+        
+        results = []
+        for start in range(0, len(urls), CONTENT_BATCH_SIZE):
+            results.extend(content_analyzer.get_features_batch(urls[start:start + CONTENT_BATCH_SIZE]))
+        
+        return jsonify({
+            "success": True,
+            "analyzed_count": len(results),
+            "results": results
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in /content_batch endpoint: {e}", exc_info=True)
+        return jsonify({
+            "error": "An internal server error occurred",
+            "details": str(e)
+        }), 500
+
 @url_bp.route("/analyzer_status", methods=["GET"])
 def analyzer_status_endpoint():
     """
     Check the status of all analyzers.
     """
     try:
+        checker = _get_checker()
         status = {
             "system_online": checker is not None,
             "ml_model_loaded": checker.models_loaded if checker else False,
@@ -172,6 +266,7 @@ def demo_endpoint():
     Run demo analysis on sample URLs.
     """
     try:
+        checker = _get_checker()
         if not checker:
             return jsonify({
                 "error": "System not initialized",
@@ -226,8 +321,10 @@ def health_endpoint():
     """
     Simple health check endpoint.
     """
+    # Don't build the checker just to answer a health probe
+    checker = _checker
     return jsonify({
-        "status": "healthy" if checker else "unhealthy",
+        "status": "unhealthy" if _checker_error and not checker else "healthy",
         "timestamp": time.time(),
         "ml_model": "loaded" if (checker and checker.models_loaded) else "not_loaded"
     })
\ No newline at end of file
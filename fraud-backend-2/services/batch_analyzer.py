@@ -0,0 +1,35 @@
+# services/batch_analyzer.py
+"""
+Batch URL analysis - runs the per-URL domain, network and reputation
+analyzers for many URLs across a pool of worker processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzers import domain_analyzer, network_analyzer, reputation_analyzer
+from analyzers.common import parse_url
+
+def analyze_url(url: str) -> dict:
+    """Runs the domain, network and reputation analyzers for one URL, parsing it once."""
+    parsed = parse_url(url)
+    return {
+        "url": url,
+        "domain_analysis": domain_analyzer.get_features(parsed),
+        "network_analysis": network_analyzer.get_network_features(parsed),
+        "reputation_analysis": reputation_analyzer.get_features(parsed),
+    }
+
+def analyze_urls(urls: list, max_workers: int = None, chunksize: int = 8) -> list:
+    """
+    Analyzes URLs in parallel worker processes, so the parsing, entropy and
+    regex work is not serialised by the GIL. Results keep the input order.
+    """
+    if not urls:
+        return []
+
+    # Load the domain model before forking so workers share its mmapped pages
+    domain_analyzer._get_model()
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return list(executor.map(analyze_url, urls, chunksize=chunksize))
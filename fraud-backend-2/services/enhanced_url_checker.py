@@ -6,6 +6,7 @@ Including all analyzers and detailed reporting
 
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from typing import Dict, List, Any
 import json
@@ -17,11 +18,15 @@ import re
 
 # Import analyzers
 from analyzers import domain_analyzer, content_analyzer, visual_analyzer, reputation_analyzer, network_analyzer
+from analyzers.common import parse_url
+
+# Bulk checks: URLs whose WHOIS/content/visual analysis runs at once
+BULK_WORKERS = 8
 
 class EnhancedURLChecker:
     """Multi-modal URL fraud detection system with ML-based scoring and detailed JSON output."""
     
-    def __init__(self):
+    def __init__(self, session=None):
         self.TRUSTED_DOMAINS = {
             'google.com', 'microsoft.com', 'apple.com', 'amazon.com', 'github.com', 
             'wikipedia.org', 'stackoverflow.com', 'youtube.com', 'facebook.com', 
@@ -33,6 +38,9 @@ class EnhancedURLChecker:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
+        # Outbound HTTP session for the reputation/network analyzers (None: their own)
+        self.session = session
+        
         # Initialize model variables
         self.model = None
         self.model_features = None
@@ -339,8 +347,11 @@ class EnhancedURLChecker:
         
         return risk_score, reason
     
-    def check_url_risk(self, url: str) -> Dict[str, Any]:
-        """Main URL risk assessment function with comprehensive JSON output"""
+    def check_url_risk(self, url: str, reputation_f: dict = None, network_f: dict = None) -> Dict[str, Any]:
+        """
+        Main URL risk assessment function with comprehensive JSON output.
+        reputation_f / network_f may be supplied from a batch lookup to skip those analyzers.
+        """
         start_time = time.time()
         
         # Quick check for trusted domains
@@ -408,10 +419,11 @@ class EnhancedURLChecker:
         try:
             # Run all analyzers
             print(f"\n📊 Running comprehensive analysis for: {url}")
+            parsed_url = parse_url(url)  # shared by the domain, reputation and network analyzers
             
             # 1. Domain Analysis
             print("  ↳ Analyzing domain...")
-            domain_f = domain_analyzer.get_features(url)
+            domain_f = domain_analyzer.get_features(parsed_url)
             
             # 2. Content Analysis
             print("  ↳ Analyzing content patterns...")
@@ -433,11 +445,13 @@ class EnhancedURLChecker:
             
             # 3. Reputation Analysis (includes Google Safe Browsing)
             print("  ↳ Checking reputation databases...")
-            reputation_f = reputation_analyzer.get_features(url)
+            if reputation_f is None:
+                reputation_f = reputation_analyzer.get_features(parsed_url, session=self.session)
             
             # 4. Network Analysis
             print("  ↳ Analyzing network characteristics...")
-            network_f = network_analyzer.get_network_features(url)
+            if network_f is None:
+                network_f = network_analyzer.get_network_features(parsed_url, session=self.session)
             
             # 5. Visual Analysis
             print("  ↳ Performing visual analysis...")
@@ -616,6 +630,48 @@ class EnhancedURLChecker:
             
             return error_report
     
+    def check_urls_risk(self, urls: List[str], max_workers: int = BULK_WORKERS) -> List[Dict[str, Any]]:
+        """
+        check_url_risk for many URLs. Reputation (one Safe Browsing batch plus
+        concurrent VirusTotal lookups) and network features (aiohttp) are fetched
+        for all URLs up front; the blocking WHOIS, content and visual analysis
+        then runs on a thread pool. Results keep the input order.
+        """
+        if not urls:
+            return []
+        
+        to_check = list(dict.fromkeys(url for url in urls if not self.is_trusted_domain(url)))
+        reputation, network = {}, {}
+        if to_check:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                reputation_future = executor.submit(reputation_analyzer.get_features_batch, to_check)
+                network_future = executor.submit(network_analyzer.get_network_features_batch, to_check)
+            
+            # A failed batch falls back to the per-URL lookups inside check_url_risk
+            try:
+                reputation = reputation_future.result()
+            except Exception as e:
+                self.logger.warning(f"Batch reputation lookup failed: {e}")
+            try:
+                network = dict(zip(to_check, network_future.result()))
+            except Exception as e:
+                self.logger.warning(f"Batch network lookup failed: {e}")
+        
+        def check(url):
+            try:
+                return self.check_url_risk(url, reputation_f=reputation.get(url), network_f=network.get(url))
+            except Exception as e:
+                return {
+                    "url": url,
+                    "overall_status": "error",
+                    "risk_score": -1,
+                    "reason": f"Analysis failed: {str(e)}",
+                    "error": str(e)
+                }
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+            return list(executor.map(check, urls))
+    
     def calculate_rule_based_score(self, url: str, domain_f: dict, content_f: dict, 
                                   reputation_f: dict, visual_f: dict) -> int:
         """Calculate risk score using rules when ML model is not available"""